@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+import timelineToObsidian
+import generateTimelineData
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+# Function to clear the caches of timelineToObsidian, so every run starts cold like a real conversion
+def clear_caches():
+    timelineToObsidian.parse_timestamp.cache_clear()
+    timelineToObsidian.format_date.cache_clear()
+    timelineToObsidian.load_map_tile.cache_clear()
+    timelineToObsidian.map_thumbnail_links.clear()
+
+# Function to get the peak resident memory of this process in MiB, or None if it cannot be measured
+def get_peak_memory_mib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB everywhere else
+    if os.uname().sysname == 'Darwin':
+        return peak / 1024 / 1024
+    return peak / 1024
+
+# Function to measure how many records per second render_day_markdown processes
+def benchmark_rendering(config, days, objects_per_day, repeat):
+    rng = random.Random(0)
+    first_day = datetime(2020, 1, 1)
+    day_groups = {}
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        timeline_objects = generateTimelineData.generate_day(rng, day, objects_per_day)
+        records = [timelineToObsidian.project_timeline_object(timeline_object) for timeline_object in timeline_objects]
+        timelineToObsidian.compute_record_metrics(records)
+        day_groups[day.strftime('%Y-%m-%d')] = records
+    record_count = days * objects_per_day
+
+    render_plan = timelineToObsidian.compile_render_plan(config, config["iframe_base_url"])
+    best = 0.0
+    for _ in range(repeat):
+        clear_caches()
+        started = time.perf_counter()
+        for dir_name, records in day_groups.items():
+            timelineToObsidian.render_day_markdown(render_plan, dir_name, records)
+        best = max(best, record_count / (time.perf_counter() - started))
+
+    return best
+
+# Function to time the split, merge and write phases of a conversion
+def benchmark_pipeline(config, input_folder, output_folder):
+    # Write everything, including map thumbnails, into the benchmark's output folder
+    folder_structure = dict(config["output_folder_structure"], output_folder=output_folder)
+    config = dict(config, output_folder_structure=folder_structure)
+    timelineToObsidian.config = config
+    clear_caches()
+    timings = {}
+
+    # Split: read the input files and group the timeline objects by day
+    started = time.perf_counter()
+    day_groups = timelineToObsidian.group_json_data_by_day(input_folder)
+    timings['split'] = time.perf_counter() - started
+    record_count = sum(len(records) for records in day_groups.values())
+
+    # Merge: render each day to Markdown
+    started = time.perf_counter()
+    render_plan = timelineToObsidian.compile_render_plan(config, config["iframe_base_url"])
+    rendered_days = {dir_name: timelineToObsidian.render_day_markdown(render_plan, dir_name, records) for dir_name, records in day_groups.items()}
+    timings['merge'] = time.perf_counter() - started
+
+    # Write: write the Markdown files into the output folder structure
+    started = time.perf_counter()
+    for dir_name in sorted(rendered_days):
+        timelineToObsidian.write_day_markdown(
+            rendered_days[dir_name], dir_name, output_folder, folder_structure["main_folder_name"],
+            folder_structure["year_format"], folder_structure["month_format"], folder_structure["day_format"]
+        )
+    timings['write'] = time.perf_counter() - started
+
+    files_written = sum(len(files) for _, _, files in os.walk(output_folder))
+    return timings, record_count, files_written
+
+# Function to print the results of the pipeline benchmark
+def print_pipeline_results(timings, record_count, files_written):
+    for phase, seconds in timings.items():
+        print(f"{phase:>6}: {seconds:8.3f} s  {record_count / seconds if seconds else 0:12,.0f} records/s")
+    total = sum(timings.values())
+    print(f"{'total':>6}: {total:8.3f} s  {record_count / total if total else 0:12,.0f} records/s")
+    print(f"records: {record_count:,}  files written: {files_written:,}")
+    peak_memory = get_peak_memory_mib()
+    if peak_memory is not None:
+        print(f"peak memory: {peak_memory:,.1f} MiB")
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of timelineToObsidian.py on synthetic data.")
+    parser.add_argument("--config", default="config.json", help="config file to convert with (default: config.json)")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    render_parser = subparsers.add_parser("render", help="micro-benchmark of the Markdown rendering")
+    render_parser.add_argument("--days", type=int, default=365, help="number of synthetic days (default: 365)")
+    render_parser.add_argument("--objects-per-day", type=int, default=20, help="number of timeline objects per day (default: 20)")
+    render_parser.add_argument("--repeat", type=int, default=5, help="number of timed runs, the best is reported (default: 5)")
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="time the split, merge and write phases of a full conversion")
+    pipeline_parser.add_argument("--input", default=None, help="existing input folder to convert instead of generating one")
+    pipeline_parser.add_argument("--years", type=int, default=1, help="number of synthetic years to generate (default: 1)")
+    pipeline_parser.add_argument("--objects-per-day", type=int, default=12, help="number of synthetic timeline objects per day (default: 12)")
+    pipeline_parser.add_argument("--missing-rate", type=float, default=0.1, help="probability of leaving out each optional field (default: 0.1)")
+    arguments = parser.parse_args()
+
+    with open(arguments.config, 'r') as config_file:
+        config = json.load(config_file)
+
+    if arguments.benchmark == "render":
+        records_per_second = benchmark_rendering(config, arguments.days, arguments.objects_per_day, arguments.repeat)
+        print(f"render: {records_per_second:,.0f} records/s")
+        return
+
+    with tempfile.TemporaryDirectory(prefix="timeline_benchmark") as benchmark_folder:
+        input_folder = arguments.input
+        if input_folder is None:
+            input_folder = os.path.join(benchmark_folder, "input")
+            generateTimelineData.generate_semantic_location_history(input_folder, 2015, arguments.years, arguments.objects_per_day, arguments.missing_rate)
+        output_folder = os.path.join(benchmark_folder, "output")
+
+        timings, record_count, files_written = benchmark_pipeline(config, input_folder, output_folder)
+        print_pipeline_results(timings, record_count, files_written)
+
+if __name__ == "__main__":
+    main()
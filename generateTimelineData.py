@@ -0,0 +1,151 @@
+import os
+import json
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+ACTIVITY_TYPES = ['IN_PASSENGER_VEHICLE', 'IN_BUS', 'MOTORCYCLING', 'WALKING', 'CYCLING', 'FLYING', 'IN_TRAIN', 'IN_FERRY', 'RUNNING', 'IN_SUBWAY', 'IN_TRAM', 'UNKNOWN_ACTIVITY_TYPE']
+SEMANTIC_TYPES = ['TYPE_HOME', 'TYPE_WORK', 'TYPE_SEARCHED_ADDRESS', 'TYPE_UNKNOWN']
+OPTIONAL_FIELDS = ('activityType', 'name', 'address', 'semanticType', 'placeId')
+
+# Function to format a datetime as a Google Takeout timestamp
+def format_timestamp(timestamp):
+    return timestamp.strftime('%Y-%m-%dT%H:%M:%S.') + f"{timestamp.microsecond // 1000:03d}Z"
+
+# Function to build an E7 coordinate pair near a point
+def build_point(rng, lat, lng, spread=0.05):
+    return int((lat + rng.uniform(-spread, spread)) * 10**7), int((lng + rng.uniform(-spread, spread)) * 10**7)
+
+# Function to build a location of one of a fixed set of places
+def build_place_location(rng, place_number, home_lat, home_lng, missing_rate):
+    place_rng = random.Random(place_number)  # The same place always has the same details
+    latitude_e7, longitude_e7 = build_point(place_rng, home_lat, home_lng)
+    location = {
+        'latitudeE7': latitude_e7,
+        'longitudeE7': longitude_e7,
+        'placeId': f"ChIJ{place_number:08d}synthetic",
+        'address': f"{place_number} Synthetic Street\nTestville",
+        'name': f"Place {place_number}",
+        'semanticType': place_rng.choice(SEMANTIC_TYPES),
+        'sourceInfo': {'deviceTag': 12345},
+        'locationConfidence': round(place_rng.uniform(40, 100), 3),
+        'calibratedProbability': round(place_rng.uniform(40, 100), 3),
+    }
+    for field in OPTIONAL_FIELDS:
+        if field in location and rng.random() < missing_rate:
+            del location[field]
+    return location
+
+# Function to build a placeVisit timeline object
+def build_place_visit(rng, start, end, location):
+    return {'placeVisit': {
+        'location': location,
+        'duration': {'startTimestamp': format_timestamp(start), 'endTimestamp': format_timestamp(end)},
+        'placeConfidence': 'HIGH_CONFIDENCE',
+        'centerLatE7': location['latitudeE7'],
+        'centerLngE7': location['longitudeE7'],
+        'visitConfidence': rng.randint(50, 100),
+        'otherCandidateLocations': [
+            {'latitudeE7': location['latitudeE7'] + rng.randint(-500, 500), 'longitudeE7': location['longitudeE7'] + rng.randint(-500, 500),
+             'placeId': f"ChIJ{rng.randrange(10**8):08d}candidate", 'semanticType': 'TYPE_UNKNOWN', 'locationConfidence': round(rng.uniform(0, 10), 3)}
+            for _ in range(rng.randint(1, 5))
+        ],
+        'editConfirmationStatus': 'NOT_CONFIRMED',
+        'locationConfidence': 92,
+        'placeVisitType': 'SINGLE_PLACE',
+        'placeVisitImportance': 'MAIN',
+    }}
+
+# Function to build an activitySegment timeline object between two locations
+def build_activity_segment(rng, start, end, start_location, end_location, missing_rate):
+    activity_type = rng.choice(ACTIVITY_TYPES)
+    waypoints = [
+        {'latE7': start_location['latitudeE7'] + rng.randint(-20000, 20000), 'lngE7': start_location['longitudeE7'] + rng.randint(-20000, 20000)}
+        for _ in range(rng.randint(2, 12))
+    ]
+    segment = {
+        'startLocation': {'latitudeE7': start_location['latitudeE7'], 'longitudeE7': start_location['longitudeE7'], 'sourceInfo': {'deviceTag': 12345}},
+        'endLocation': {'latitudeE7': end_location['latitudeE7'], 'longitudeE7': end_location['longitudeE7'], 'sourceInfo': {'deviceTag': 12345}},
+        'duration': {'startTimestamp': format_timestamp(start), 'endTimestamp': format_timestamp(end)},
+        'distance': rng.randint(50, 50000),
+        'activityType': activity_type,
+        'confidence': 'HIGH',
+        'activities': [{'activityType': activity_type, 'probability': round(rng.uniform(50, 100), 6)}] + [
+            {'activityType': other_type, 'probability': round(rng.uniform(0, 10), 6)} for other_type in rng.sample(ACTIVITY_TYPES, 3)
+        ],
+        'waypointPath': {'waypoints': waypoints, 'source': 'INFERRED', 'distanceMeters': rng.uniform(50, 50000), 'travelMode': 'DRIVE', 'confidence': 0.9},
+        'simplifiedRawPath': {'points': [
+            {'latE7': waypoint['latE7'], 'lngE7': waypoint['lngE7'], 'accuracyMeters': rng.randint(3, 50), 'timestamp': format_timestamp(start)}
+            for waypoint in waypoints
+        ]},
+    }
+    if rng.random() < missing_rate:
+        del segment['activityType']
+    return {'activitySegment': segment}
+
+# Function to build one day of alternating place visits and activity segments
+def generate_day(rng, day, objects_per_day, missing_rate=0.0, home_lat=51.5, home_lng=-0.1, place_count=50):
+    timeline_objects = []
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc) + timedelta(milliseconds=rng.randrange(1000))
+    step = timedelta(seconds=86400 // (objects_per_day + 1))
+    location = build_place_location(rng, rng.randrange(place_count), home_lat, home_lng, missing_rate)
+
+    for index in range(objects_per_day):
+        # Vary the lengths a little, but stay within the day
+        end = start + step + timedelta(milliseconds=rng.randrange(-30000, 30000))
+        if index % 2 == 0:
+            timeline_objects.append(build_place_visit(rng, start, end, location))
+        else:
+            next_location = build_place_location(rng, rng.randrange(place_count), home_lat, home_lng, missing_rate)
+            timeline_objects.append(build_activity_segment(rng, start, end, location, next_location, missing_rate))
+            location = next_location
+        start = end
+
+    return timeline_objects
+
+# Function to write a Semantic Location History folder with one JSON file per month
+def generate_semantic_location_history(output_folder, start_year, years, objects_per_day, missing_rate=0.0, seed=0):
+    rng = random.Random(seed)
+    day = datetime(start_year, 1, 1)
+    end_day = datetime(start_year + years, 1, 1)
+    file_count = 0
+    object_count = 0
+
+    while day < end_day:
+        # Collect a month of timeline objects and write them like Google Takeout does
+        month_objects = []
+        month = day.month
+        while day < end_day and day.month == month:
+            month_objects.extend(generate_day(rng, day, objects_per_day, missing_rate))
+            day += timedelta(days=1)
+
+        first_day = day - timedelta(days=1)
+        month_folder = os.path.join(output_folder, "Semantic Location History", str(first_day.year))
+        os.makedirs(month_folder, exist_ok=True)
+        month_file_path = os.path.join(month_folder, first_day.strftime('%Y_%B').upper() + ".json")
+        with open(month_file_path, 'w', encoding='utf-8') as month_file:
+            json.dump({'timelineObjects': month_objects}, month_file, indent=2)
+
+        file_count += 1
+        object_count += len(month_objects)
+
+    return file_count, object_count
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic Google Takeout Semantic Location History data.")
+    parser.add_argument("--output", default="./input", help="folder to create the Semantic Location History folder in (default: ./input)")
+    parser.add_argument("--start-year", type=int, default=2015, help="first year to generate (default: 2015)")
+    parser.add_argument("--years", type=int, default=1, help="number of years to generate (default: 1)")
+    parser.add_argument("--objects-per-day", type=int, default=12, help="number of timeline objects per day (default: 12)")
+    parser.add_argument("--missing-rate", type=float, default=0.1, help="probability of leaving out each optional field (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, the same seed always generates the same data (default: 0)")
+    arguments = parser.parse_args()
+
+    file_count, object_count = generate_semantic_location_history(
+        arguments.output, arguments.start_year, arguments.years, arguments.objects_per_day, arguments.missing_rate, arguments.seed
+    )
+    print(f"Wrote {object_count} timeline objects to {file_count} files in {arguments.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+import sys
+import csv
+import json
+import argparse
+
+import timelineToObsidian
+
+# Columns printed for each record, with the E7 coordinates converted to degrees
+QUERY_COLUMNS = ('date', 'kind', 'start_timestamp', 'end_timestamp', 'duration', 'activity_type', 'distance', 'speed',
+                 'lat', 'lng', 'start_lat', 'start_lng', 'end_lat', 'end_lng', 'name', 'address', 'semantic_type', 'place_id', 'source')
+
+# Function to parse a "min_lat,min_lng,max_lat,max_lng" bounding box
+def parse_bbox(text):
+    try:
+        min_lat, min_lng, max_lat, max_lng = (float(value) for value in text.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected min_lat,min_lng,max_lat,max_lng")
+    return min(min_lat, max_lat), min(min_lng, max_lng), max(min_lat, max_lat), max(min_lng, max_lng)
+
+# Function to convert a row of the record store into the printed columns
+def format_row(row):
+    values = dict(row)
+    for prefix in ('', 'start_', 'end_'):
+        for axis in ('lat', 'lng'):
+            e7_value = row[f'{prefix}{axis}_e7']
+            values[prefix + axis] = timelineToObsidian.e7_to_standard(e7_value) if e7_value is not None else None
+    return {column: values[column] for column in QUERY_COLUMNS}
+
+# Function to print the records matching the filters as CSV or JSON lines
+def print_records(record_store, arguments):
+    rows = record_store.query_records(arguments.date_from, arguments.date_to, arguments.bbox, arguments.activity_type, arguments.kind, arguments.place_id)
+    if arguments.format == "json":
+        for row in rows:
+            print(json.dumps(format_row(row), ensure_ascii=False))
+        return
+
+    writer = csv.DictWriter(sys.stdout, fieldnames=QUERY_COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(format_row(row))
+
+# Function to regenerate the day notes of a date range from the record store
+def regenerate_notes(config, record_store, arguments):
+    folder_structure = config["output_folder_structure"]
+    day_groups = record_store.load_day_groups(arguments.date_from, arguments.date_to)
+
+    # Label unnamed visits with the place clusters of the conversions
+    place_clusters = None
+    if config.get("cluster_unnamed_places", False):
+        clusters_path = os.path.join(folder_structure["output_folder"], config.get("cluster_file_name", ".timeline_clusters.json"))
+        place_clusters = timelineToObsidian.PlaceClusters.load(clusters_path, config.get("cluster_radius_meters", 100))
+
+    timelineToObsidian.render_day_groups(
+        day_groups, folder_structure["output_folder"], config["iframe_base_url"], folder_structure["main_folder_name"],
+        folder_structure["year_format"], folder_structure["month_format"], folder_structure["day_format"], place_clusters=place_clusters
+    )
+    if place_clusters is not None:
+        place_clusters.save(clusters_path)
+    print(f"days: {len(day_groups):,}  files written: {timelineToObsidian.instrumentation.counters['files_written']:,}", file=sys.stderr)
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Query the record store written by timelineToObsidian.py, or regenerate day notes from it.")
+    parser.add_argument("--config", default="config.json", help="config file naming the database_file (default: config.json)")
+    parser.add_argument("--database", default=None, help="record store to use instead of the database_file config option")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    records_parser = subparsers.add_parser("records", help="print the records matching all of the given filters")
+    notes_parser = subparsers.add_parser("notes", help="regenerate the day notes of a date range without reading the input files")
+    for subparser in (records_parser, notes_parser):
+        subparser.add_argument("--from", dest="date_from", default=None, metavar="YYYY-MM-DD", help="first day (default: the first stored day)")
+        subparser.add_argument("--to", dest="date_to", default=None, metavar="YYYY-MM-DD", help="last day (default: the last stored day)")
+    records_parser.add_argument("--bbox", type=parse_bbox, default=None, metavar="MIN_LAT,MIN_LNG,MAX_LAT,MAX_LNG",
+                                help="only place visits in the box, and activity segments starting or ending in it")
+    records_parser.add_argument("--activity-type", default=None, help="only activity segments of this type, e.g. CYCLING or \"in passenger vehicle\"")
+    records_parser.add_argument("--kind", choices=("activitySegment", "placeVisit"), default=None, help="only records of this kind")
+    records_parser.add_argument("--place-id", default=None, help="only place visits of this place ID")
+    records_parser.add_argument("--format", choices=("csv", "json"), default="csv", help="output format (default: csv)")
+    arguments = parser.parse_args()
+
+    with open(arguments.config, 'r') as config_file:
+        config = json.load(config_file)
+    database_file = arguments.database or config.get("database_file", "")
+    if not database_file:
+        parser.error("no record store: set database_file in the config and run timelineToObsidian.py, or pass --database")
+    if not os.path.exists(database_file):
+        parser.error(f"{database_file} does not exist, run timelineToObsidian.py with database_file set first")
+
+    # The renderer reads the global config of timelineToObsidian
+    timelineToObsidian.config = config
+    record_store = timelineToObsidian.RecordStore(database_file, config["input_folder"])
+    try:
+        if arguments.command == "records":
+            print_records(record_store, arguments)
+        else:
+            regenerate_notes(config, record_store, arguments)
+    finally:
+        record_store.close(commit=False)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,29 @@
 import os
+import re
+import sys
+import time
 import json
+import signal
+import base64
+import sqlite3
+import math
+import hashlib
 import tempfile
+import cProfile
+import argparse
+import calendar
+import itertools
 import shutil  # Import the shutil module for file and directory cleanup
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
+from functools import lru_cache
+
+try:
+    import numpy  # Optional, calculates the distances and speeds of each batch of records in one pass
+except ImportError:
+    numpy = None
 
 # Constants
 EMOJI_MAPPING = {
@@ -22,6 +43,74 @@ EMOJI_MAPPING = {
     'SAILING': '⛵',
     'IN_VEHICLE': '🚗'
 }
+RECORDS_ACTIVITY_TYPES = {  # Activity types of Records.json points mapped to the activity types of activity segments
+    'IN_VEHICLE': 'IN_VEHICLE',
+    'IN_ROAD_VEHICLE': 'IN_VEHICLE',
+    'IN_CAR': 'IN_PASSENGER_VEHICLE',
+    'IN_FOUR_WHEELER_VEHICLE': 'IN_PASSENGER_VEHICLE',
+    'IN_TWO_WHEELER_VEHICLE': 'MOTORCYCLING',
+    'IN_BUS': 'IN_BUS',
+    'IN_RAIL_VEHICLE': 'IN_TRAIN',
+    'ON_BICYCLE': 'CYCLING',
+    'ON_FOOT': 'WALKING',
+    'WALKING': 'WALKING',
+    'RUNNING': 'RUNNING'
+}
+EARTH_RADIUS_METERS = 6371008.8  # Mean radius of the Earth
+METRICS_BATCH_SIZE = 4096  # Number of records whose durations, distances and speeds are calculated at once
+JSON_CHUNK_SIZE = 1024 * 1024  # Number of characters read at a time when streaming JSON files
+JSON_WHITESPACE = re.compile(r'[\s,]*')  # Whitespace and separators between JSON array items
+MANIFEST_VERSION = 6  # Bump when the manifest layout or the records read from the input change to force a full rebuild
+ParsedTimestamp = namedtuple('ParsedTimestamp', ['date_key', 'time_24_hour', 'epoch_seconds'])  # A timestamp parsed once into everything the script needs
+RENDER_CONFIG_KEYS = {'iframe_base_url', 'records_stop_radius_meters', 'records_min_stop_minutes', 'records_max_accuracy_meters', 'cluster_unnamed_places', 'cluster_radius_meters',
+                      'map_thumbnails', 'map_thumbnail_folder', 'map_thumbnail_zoom', 'map_thumbnail_size', 'map_thumbnail_precision', 'map_tile_cache_folder'}  # Config keys besides the output_ ones that change the generated Markdown
+RECORD_SUFFIXES = {'activitySegment': 'activity_segment', 'placeVisit': 'place_visit'}  # Type suffixes of the record kinds, used in temporary file names and sort keys
+RECORD_STORE_VERSION = 2  # Bump when the record store schema changes to rebuild the database
+RECORD_STORE_SCHEMA = """
+CREATE TABLE sources (source TEXT PRIMARY KEY);
+CREATE TABLE records (
+    source TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    sort_key TEXT NOT NULL,
+    start_epoch INTEGER NOT NULL,
+    end_epoch INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    start_timestamp TEXT NOT NULL,
+    end_timestamp TEXT NOT NULL,
+    activity_type TEXT,
+    start_lat_e7 INTEGER,
+    start_lng_e7 INTEGER,
+    end_lat_e7 INTEGER,
+    end_lng_e7 INTEGER,
+    lat_e7 INTEGER,
+    lng_e7 INTEGER,
+    name TEXT,
+    address TEXT,
+    semantic_type TEXT,
+    place_id TEXT,
+    distance REAL,
+    duration INTEGER,
+    speed REAL
+);
+CREATE INDEX records_date ON records (date);
+CREATE INDEX records_place_id ON records (place_id);
+CREATE INDEX records_source ON records (source);
+"""  # Tables of the record store, the records columns after end_epoch are the STORED_RECORD_FIELDS
+STORED_RECORD_FIELDS = ('kind', 'start_timestamp', 'end_timestamp', 'activity_type', 'start_lat_e7', 'start_lng_e7', 'end_lat_e7', 'end_lng_e7',
+                        'lat_e7', 'lng_e7', 'name', 'address', 'semantic_type', 'place_id', 'distance', 'duration', 'speed')  # TimelineRecord fields kept in the record store, cluster labels are not
+CLUSTERS_VERSION = 2  # Bump when the layout of the clusters file changes
+RENDER_CHUNK_SIZE = 32  # Number of days sent to a worker process at a time
+MAP_TILE_SIZE = 256  # Width and height of slippy map tiles in pixels
+MAP_TILE_TYPES = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.webp': 'image/webp'}  # Tile file extensions looked for in the tile cache
+MAP_TILE_CACHE_SIZE = 256  # Number of map tiles kept in memory, neighbouring thumbnails share their tiles
+MAX_MERCATOR_LATITUDE = 85.05112878  # Latitudes beyond this are outside Web Mercator maps
+TIMESTAMP_CACHE_SIZE = 1 << 16  # Number of parsed timestamps kept, consecutive records share their end and start timestamps
+DATE_CACHE_SIZE = 1 << 16  # Number of formatted day names kept
+INSTRUMENTATION_COUNTERS = ('input_files', 'bytes_read', 'objects', 'temp_files_written', 'days_rendered', 'files_written', 'files_skipped', 'bytes_written')  # Counters reported by --progress and --stats
+SUMMARY_TOP_PLACES = 10  # Number of places listed in each period summary note, by time spent there
+PROGRESS_INTERVAL = 0.2  # Minimum number of seconds between progress line updates
+TIMESTAMP_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.\d+)?(Z|[+-]\d{2}:?\d{2})?$')  # ISO timestamps as written by Google Takeout
 
 # Function to clean invalid characters from a filename
 def clean_filename(filename):
@@ -40,15 +129,503 @@ def text_to_emoji(text):
     emoji = EMOJI_MAPPING.get(text, '❓')  # Using the EMOJI_MAPPING constant
     return emoji
 
+# Function to parse a timestamp once into its day, 24-hour time and epoch seconds
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def parse_timestamp(timestamp_str):
+    match = TIMESTAMP_PATTERN.match(timestamp_str)
+    if match:
+        year, month, day, hour, minute, second, zone = match.groups()
+        # The day and time are kept as written, the epoch seconds take the UTC offset into account
+        offset = 0
+        if zone and zone != 'Z':
+            offset = (int(zone[1:3]) * 3600 + int(zone[-2:]) * 60) * (-1 if zone[0] == '-' else 1)
+        epoch_seconds = calendar.timegm((int(year), int(month), int(day), int(hour), int(minute), int(second))) - offset
+        return ParsedTimestamp(timestamp_str[:10], timestamp_str[11:19], epoch_seconds)
+
+    # Fall back to the standard library for any other ISO format, treating timestamps without an offset as UTC
+    timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+    offset = timestamp.utcoffset()
+    epoch_seconds = calendar.timegm(timestamp.timetuple()) - (int(offset.total_seconds()) if offset else 0)
+    return ParsedTimestamp(timestamp.strftime('%Y-%m-%d'), timestamp.strftime('%H:%M:%S'), epoch_seconds)
+
 # Function to convert a timestamp to 24-hour time format
 def convert_to_24_hour_format(timestamp_str):
-    # Parse the timestamp string to a datetime object
-    timestamp = datetime.fromisoformat(timestamp_str)
+    return parse_timestamp(timestamp_str).time_24_hour
+
+# Function to format a day (%Y-%m-%d) with a strftime format, computed once per day and format
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def format_date(date_key, date_format):
+    return datetime.strptime(date_key, '%Y-%m-%d').strftime(date_format)
+
+# Function to stream the items of a top-level JSON array one at a time
+def iter_json_array(file_path, array_key, chunk_size=JSON_CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    key_token = f'"{array_key}"' if array_key is not None else ""
+
+    with open(file_path, 'r', encoding='utf-8') as json_file:
+        # Read until the array key is found, keeping enough of the previous chunk to match a key split across chunks
+        buffer = ""
+        while True:
+            chunk = json_file.read(chunk_size)
+            if not chunk:
+                raise KeyError(array_key)
+            buffer = buffer[-len(key_token):] + chunk
+            key_index = buffer.find(key_token)
+            if key_index != -1:
+                break
+
+        # Skip to the opening bracket of the array, which is the first character of a file that is a top-level array
+        buffer = buffer[key_index + len(key_token):]
+        while '[' not in buffer:
+            chunk = json_file.read(chunk_size)
+            if not chunk:
+                raise KeyError(array_key)
+            buffer += chunk
+        buffer = buffer[buffer.index('[') + 1:]
+        position = 0
+        end_of_file = False
+
+        while True:
+            position = JSON_WHITESPACE.match(buffer, position).end()
+
+            # Read more data if the buffer is exhausted
+            if position == len(buffer):
+                if end_of_file:
+                    raise ValueError(f"Unterminated '{array_key}' array in {file_path}")
+                chunk = json_file.read(chunk_size)
+                end_of_file = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            if buffer[position] == ']':
+                return
 
-    # Format the datetime object as a 24-hour time string
-    time_str_24_hour = timestamp.strftime('%H:%M:%S')
+            # Decode the next item, reading more data if it is incomplete
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                end = None
+            if end is None or (end == len(buffer) and not end_of_file):
+                if end_of_file:
+                    raise ValueError(f"Invalid '{array_key}' array in {file_path}")
+                chunk = json_file.read(chunk_size)
+                end_of_file = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            yield item
+            position = end
+
+# Function to calculate the great-circle distance in meters between two points in degrees
+def haversine_distance(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+# Function to format epoch seconds as a UTC timestamp
+def format_epoch_timestamp(epoch_seconds):
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+# Function to parse a "lat°, lng°" or "geo:lat,lng" string of the Timeline export into an E7 location
+def parse_lat_lng(lat_lng):
+    if isinstance(lat_lng, dict):
+        lat_lng = lat_lng.get('latLng')
+    if not lat_lng:
+        return None
+    try:
+        lat, lng = lat_lng.replace('geo:', '').replace('°', '').split(',')
+        return {'latitudeE7': round(float(lat) * 10**7), 'longitudeE7': round(float(lng) * 10**7)}
+    except ValueError:
+        return None
+
+# Function to find the reader of an input file from the first top-level key in it
+def get_timeline_reader(input_file_path, chunk_size=JSON_CHUNK_SIZE):
+    key_tokens = {f'"{key}"': key for key in TIMELINE_READERS if key is not None}
+    longest_token = max(len(key_token) for key_token in key_tokens)
+
+    with open(input_file_path, 'r', encoding='utf-8') as json_file:
+        buffer = ""
+        while True:
+            chunk = json_file.read(chunk_size)
+            if not chunk:
+                return None
+            # A file that is a top-level array is an on-device Timeline export from iOS
+            if not buffer.strip() and chunk.strip():
+                if chunk.lstrip().startswith('['):
+                    return TIMELINE_READERS[None]
+            buffer = buffer[-longest_token:] + chunk
+
+            # The key appearing first decides the format
+            positions = [(buffer.find(key_token), key) for key_token, key in key_tokens.items() if key_token in buffer]
+            if positions:
+                return TIMELINE_READERS[min(positions)[1]]
+
+# Function to read the timeline objects of a legacy Semantic Location History file
+def read_semantic_location_history(input_file_path):
+    return iter_json_array(input_file_path, 'timelineObjects')
+
+# Function to convert an activity type to the legacy format, as iOS exports write e.g. "in passenger vehicle" for IN_PASSENGER_VEHICLE
+def normalize_activity_type(activity_type):
+    return activity_type.upper().replace(' ', '_')
+
+# Function to convert the semantic segments of an on-device Timeline export into timeline objects
+def read_timeline_export(input_file_path, array_key='semanticSegments'):
+    for segment in iter_json_array(input_file_path, array_key):
+        duration = {'startTimestamp': segment.get('startTime'), 'endTimestamp': segment.get('endTime')}
+        if not duration['startTimestamp'] or not duration['endTimestamp']:
+            continue
+
+        if 'visit' in segment:
+            candidate = segment['visit'].get('topCandidate', {})
+            location = parse_lat_lng(candidate.get('placeLocation')) or {}
+            place_id = candidate.get('placeId', candidate.get('placeID'))
+            if place_id:
+                location['placeId'] = place_id
+            if candidate.get('semanticType'):
+                location['semanticType'] = candidate['semanticType']
+            yield {'placeVisit': {'location': location, 'duration': duration}}
+
+        elif 'activity' in segment:
+            activity = segment['activity']
+            activity_segment = {'duration': duration}
+            start_location = parse_lat_lng(activity.get('start'))
+            end_location = parse_lat_lng(activity.get('end'))
+            if start_location:
+                activity_segment['startLocation'] = start_location
+            if end_location:
+                activity_segment['endLocation'] = end_location
+            activity_type = activity.get('topCandidate', {}).get('type')
+            if activity_type:
+                activity_segment['activityType'] = normalize_activity_type(activity_type)
+            if activity.get('distanceMeters') is not None:
+                activity_segment['distance'] = float(activity['distanceMeters'])
+            yield {'activitySegment': activity_segment}
+
+        # timelinePath and timelineMemory segments have no counterpart in the notes
+
+# Function to read an on-device Timeline export from iOS, which is a top-level array of segments
+def read_timeline_export_array(input_file_path):
+    return read_timeline_export(input_file_path, array_key=None)
+
+# Function to get the epoch seconds of a Records.json point
+def get_record_epoch_seconds(point):
+    if 'timestampMs' in point:
+        return int(point['timestampMs']) // 1000
+    if 'timestamp' in point:
+        return parse_timestamp(point['timestamp']).epoch_seconds
+    return None
+
+# Function to get the most likely activity type of a Records.json point
+def get_record_activity_type(point):
+    for activity in point.get('activity', ()):
+        for candidate in activity.get('activity', ())[:1]:
+            return RECORDS_ACTIVITY_TYPES.get(candidate.get('type'))
+    return None
+
+# Function to stream the raw points of a Records.json file and aggregate them into place visits and activity segments
+def read_records(input_file_path):
+    stop_radius = config.get("records_stop_radius_meters", 100)
+    min_stop_seconds = config.get("records_min_stop_minutes", 5) * 60
+    max_accuracy = config.get("records_max_accuracy_meters", 200)
+
+    # The current cluster of points within stop_radius of its first point
+    cluster = None
+    # The movement since the last stop: where and when it started, its path length and activity votes
+    movement_start = None
+    path_distance = 0.0
+    activity_votes = {}
+    previous_point = None
+
+    def build_activity_segment(start, end, distance, votes):
+        activity_segment = {
+            'startLocation': {'latitudeE7': round(start[1] * 10**7), 'longitudeE7': round(start[2] * 10**7)},
+            'endLocation': {'latitudeE7': round(end[1] * 10**7), 'longitudeE7': round(end[2] * 10**7)},
+            'duration': {'startTimestamp': format_epoch_timestamp(start[0]), 'endTimestamp': format_epoch_timestamp(end[0])},
+            'distance': round(distance),
+        }
+        if votes:
+            activity_segment['activityType'] = max(sorted(votes), key=votes.get)
+        return {'activitySegment': activity_segment}
+
+    def flush_cluster(final):
+        nonlocal movement_start, path_distance, activity_votes
+        first, last = cluster['first'], cluster['last']
+
+        if last[0] - first[0] >= min_stop_seconds:
+            # The cluster is a stop: emit the movement leading to it and the visit itself
+            if movement_start is not None and first[0] > movement_start[0]:
+                yield build_activity_segment(movement_start, first, cluster['path_distance'], activity_votes)
+            yield {'placeVisit': {
+                'location': {'latitudeE7': round(cluster['lat_sum'] / cluster['count'] * 10**7), 'longitudeE7': round(cluster['lng_sum'] / cluster['count'] * 10**7)},
+                'duration': {'startTimestamp': format_epoch_timestamp(first[0]), 'endTimestamp': format_epoch_timestamp(last[0])},
+            }}
+            movement_start = last
+            path_distance = 0.0
+            activity_votes = {}
+        else:
+            # The cluster was too short to be a stop, so its points are part of the movement
+            for activity_type, votes in cluster['activity_votes'].items():
+                activity_votes[activity_type] = activity_votes.get(activity_type, 0) + votes
+            if movement_start is None:
+                movement_start = first
+            if final and last[0] > movement_start[0]:
+                yield build_activity_segment(movement_start, last, path_distance, activity_votes)
+
+    for point in iter_json_array(input_file_path, 'locations'):
+        epoch_seconds = get_record_epoch_seconds(point)
+        if epoch_seconds is None or 'latitudeE7' not in point or point.get('accuracy', 0) > max_accuracy:
+            continue
+        current = (epoch_seconds, point['latitudeE7'] / 10**7, point['longitudeE7'] / 10**7)
+        leg_distance = haversine_distance(previous_point[1], previous_point[2], current[1], current[2]) if previous_point else 0.0
+        previous_point = current
+
+        # Extend the cluster while the points stay within the stop radius of its first point
+        if cluster is not None and haversine_distance(cluster['first'][1], cluster['first'][2], current[1], current[2]) <= stop_radius:
+            cluster['last'] = current
+            cluster['lat_sum'] += current[1]
+            cluster['lng_sum'] += current[2]
+            cluster['count'] += 1
+            path_distance += leg_distance
+        else:
+            if cluster is not None:
+                yield from flush_cluster(final=False)
+            # The leg leaving the previous cluster belongs to the movement after it
+            path_distance += leg_distance
+            cluster = {'first': current, 'last': current, 'lat_sum': current[1], 'lng_sum': current[2], 'count': 1, 'path_distance': path_distance, 'activity_votes': {}}
+
+        activity_type = get_record_activity_type(point)
+        if activity_type:
+            cluster['activity_votes'][activity_type] = cluster['activity_votes'].get(activity_type, 0) + 1
+
+    if cluster is not None:
+        yield from flush_cluster(final=True)
+
+# Readers of each input format, keyed by the top-level array key identifying the format
+TIMELINE_READERS = {
+    'timelineObjects': read_semantic_location_history,  # Semantic Location History month files
+    'semanticSegments': read_timeline_export,  # On-device Timeline export from Android
+    'locations': read_records,  # Raw Records.json
+    None: read_timeline_export_array,  # On-device Timeline export from iOS, which is a top-level array
+}
 
-    return time_str_24_hour
+# Function to read the timeline objects of any supported input file
+def iter_timeline_objects(input_file_path):
+    timeline_reader = get_timeline_reader(input_file_path)
+    if timeline_reader is None:
+        # Other Takeout files such as Settings.json have no timeline data
+        return iter(())
+    return timeline_reader(input_file_path)
+
+# Class holding the fields of a timeline object used by the notes. Timeline objects are projected into records as soon as
+# they are parsed, so the waypoints, raw paths and candidate locations they carry are never kept in memory
+class TimelineRecord:
+    __slots__ = ('kind', 'start_timestamp', 'end_timestamp', 'activity_type', 'start_lat_e7', 'start_lng_e7', 'end_lat_e7', 'end_lng_e7',
+                 'lat_e7', 'lng_e7', 'name', 'address', 'semantic_type', 'place_id', 'distance', 'duration', 'speed', 'cluster_label')
+
+    def __init__(self, kind, start_timestamp, end_timestamp, activity_type=None, start_lat_e7=None, start_lng_e7=None, end_lat_e7=None, end_lng_e7=None,
+                 lat_e7=None, lng_e7=None, name=None, address=None, semantic_type=None, place_id=None, distance=None, duration=None, speed=None, cluster_label=None):
+        self.kind = kind  # 'activitySegment' or 'placeVisit'
+        self.start_timestamp = start_timestamp
+        self.end_timestamp = end_timestamp
+        self.activity_type = activity_type
+        self.start_lat_e7 = start_lat_e7
+        self.start_lng_e7 = start_lng_e7
+        self.end_lat_e7 = end_lat_e7
+        self.end_lng_e7 = end_lng_e7
+        self.lat_e7 = lat_e7
+        self.lng_e7 = lng_e7
+        self.name = name
+        self.address = address
+        self.semantic_type = semantic_type
+        self.place_id = place_id
+        self.distance = distance  # Meters, the straight line between the start and end if the input has no distance
+        self.duration = duration  # Seconds, set by compute_record_metrics
+        self.speed = speed  # Meters per second, set by compute_record_metrics
+        self.cluster_label = cluster_label  # Label of the place cluster of unnamed visits, set by assign_cluster_labels
+
+    # Function to convert the record into a dict of its set fields, e.g. to write it to a JSON file
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__ if getattr(self, field) is not None}
+
+    # Function to create a record from a dict written by to_dict
+    @classmethod
+    def from_dict(cls, fields):
+        return cls(**fields)
+
+# Function to intern a string read from JSON, so values repeated in many records such as activity types and place IDs are stored once
+def intern_string(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+# Function to project a timeline object onto a TimelineRecord, or None for unknown objects
+def project_timeline_object(timeline_object):
+    if 'activitySegment' in timeline_object:
+        segment = timeline_object['activitySegment']
+        start_location = segment.get('startLocation') or {}
+        end_location = segment.get('endLocation') or {}
+        return TimelineRecord(
+            'activitySegment', segment['duration']['startTimestamp'], segment['duration']['endTimestamp'],
+            activity_type=intern_string(segment.get('activityType')),
+            start_lat_e7=start_location.get('latitudeE7'), start_lng_e7=start_location.get('longitudeE7'),
+            end_lat_e7=end_location.get('latitudeE7'), end_lng_e7=end_location.get('longitudeE7'),
+            distance=segment.get('distance'),
+        )
+
+    if 'placeVisit' in timeline_object:
+        visit = timeline_object['placeVisit']
+        location = visit.get('location') or {}
+        return TimelineRecord(
+            'placeVisit', visit['duration']['startTimestamp'], visit['duration']['endTimestamp'],
+            lat_e7=location.get('latitudeE7'), lng_e7=location.get('longitudeE7'),
+            name=location.get('name'), address=location.get('address'),
+            semantic_type=intern_string(location.get('semanticType')), place_id=intern_string(location.get('placeId')),
+        )
+
+    return None
+
+# Function to calculate the duration of every record and the distance and speed of every activity segment of a batch in one pass
+def compute_record_metrics(records):
+    if not records:
+        return
+    start_epochs = [parse_timestamp(record.start_timestamp).epoch_seconds for record in records]
+    end_epochs = [parse_timestamp(record.end_timestamp).epoch_seconds for record in records]
+    # Place visits have no distance, and activity segments without one get the straight line between their start and end
+    is_segment = [record.kind == 'activitySegment' for record in records]
+    known_distances = [record.distance if segment else None for record, segment in zip(records, is_segment)]
+    coordinates = [(record.start_lat_e7, record.start_lng_e7, record.end_lat_e7, record.end_lng_e7) if segment else (None, None, None, None) for record, segment in zip(records, is_segment)]
+
+    if numpy is not None:
+        durations = numpy.array(end_epochs, dtype=numpy.int64) - numpy.array(start_epochs, dtype=numpy.int64)
+        # Missing coordinates and distances become NaN, and so do the results calculated from them
+        lat1, lng1, lat2, lng2 = numpy.radians(numpy.array(coordinates, dtype=float).T / 10**7)
+        a = numpy.sin((lat2 - lat1) / 2) ** 2 + numpy.cos(lat1) * numpy.cos(lat2) * numpy.sin((lng2 - lng1) / 2) ** 2
+        distances = numpy.array(known_distances, dtype=float)
+        distances = numpy.where(numpy.isnan(distances), 2 * EARTH_RADIUS_METERS * numpy.arcsin(numpy.sqrt(a)), distances)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            speeds = numpy.where(durations > 0, distances / durations, numpy.nan)
+        durations, distances, speeds = durations.tolist(), distances.tolist(), speeds.tolist()
+    else:
+        durations = [end - start for start, end in zip(start_epochs, end_epochs)]
+        distances = []
+        for known_distance, (start_lat_e7, start_lng_e7, end_lat_e7, end_lng_e7) in zip(known_distances, coordinates):
+            if known_distance is not None:
+                distances.append(known_distance)
+            elif None in (start_lat_e7, start_lng_e7, end_lat_e7, end_lng_e7):
+                distances.append(math.nan)
+            else:
+                distances.append(haversine_distance(e7_to_standard(start_lat_e7), e7_to_standard(start_lng_e7), e7_to_standard(end_lat_e7), e7_to_standard(end_lng_e7)))
+        speeds = [distance / duration if duration > 0 else math.nan for distance, duration in zip(distances, durations)]
+
+    for record, segment, duration, distance, speed in zip(records, is_segment, durations, distances, speeds):
+        record.duration = duration
+        if segment:
+            record.distance = None if math.isnan(distance) else distance
+            record.speed = None if math.isnan(speed) else speed
+
+# Function to read the records of any supported input file, dropping each timeline object once it is projected
+def iter_timeline_records(input_file_path):
+    batch = []
+    for timeline_object in iter_timeline_objects(input_file_path):
+        record = project_timeline_object(timeline_object)
+        if record is not None:
+            batch.append(record)
+            if len(batch) == METRICS_BATCH_SIZE:
+                compute_record_metrics(batch)
+                yield from batch
+                batch = []
+    compute_record_metrics(batch)
+    yield from batch
+
+# Function to get the sort key of a record, which is also its file name in the temporary folder
+def get_record_sort_key(record):
+    return clean_filename(f"{record.start_timestamp}_{RECORD_SUFFIXES[record.kind]}.json")
+
+# Class collecting phase timers and counters of a conversion, and optionally showing live progress
+class Instrumentation:
+    def __init__(self, show_progress=False, progress_stream=sys.stderr):
+        self.show_progress = show_progress
+        self.progress_stream = progress_stream
+        self.counters = dict.fromkeys(INSTRUMENTATION_COUNTERS, 0)
+        self.totals = {}
+        self.timers = {}
+        self.current_phase = None
+        self.started = time.perf_counter()
+        self.last_progress = 0.0
+
+    # Time a phase, adding to the time of earlier runs of the same phase
+    @contextmanager
+    def phase(self, name):
+        previous_phase = self.current_phase
+        self.current_phase = name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] = self.timers.get(name, 0.0) + time.perf_counter() - started
+            self.current_phase = previous_phase
+
+    # Add to a counter
+    def add(self, counter, amount=1):
+        self.counters[counter] += amount
+        if self.show_progress:
+            self.report_progress()
+
+    # Set the expected final value of a counter, shown in the progress line
+    def set_total(self, counter, total):
+        self.totals[counter] = total
+
+    # Write the progress line, at most every PROGRESS_INTERVAL seconds unless forced
+    def report_progress(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last_progress < PROGRESS_INTERVAL:
+            return
+        self.last_progress = now
+
+        fields = []
+        for counter in ('input_files', 'objects', 'days_rendered', 'files_written', 'files_skipped'):
+            if self.counters[counter] or counter in self.totals:
+                total = self.totals.get(counter)
+                fields.append(f"{counter.replace('_', ' ')} {self.counters[counter]:,}" + (f"/{total:,}" if total is not None else ""))
+        self.progress_stream.write(f"\r[{now - self.started:7.1f}s] {self.current_phase or 'done'}: {', '.join(fields)}\033[K")
+        self.progress_stream.flush()
+
+    # Get the timers and counters as a dictionary
+    def get_report(self):
+        return {
+            "elapsed_seconds": round(time.perf_counter() - self.started, 6),
+            "phase_seconds": {name: round(seconds, 6) for name, seconds in self.timers.items()},
+            "counters": dict(self.counters),
+        }
+
+    # Write the final progress line and a summary of the phases
+    def report_summary(self):
+        self.report_progress(force=True)
+        self.progress_stream.write("\n")
+        for name, seconds in self.timers.items():
+            self.progress_stream.write(f"  {name}: {seconds:.3f}s\n")
+        self.progress_stream.write(f"  read {self.counters['bytes_read']:,} bytes, wrote {self.counters['bytes_written']:,} bytes\n")
+
+    # Write the timers and counters to a JSON file
+    def write_report(self, report_path):
+        with open(report_path, 'w', encoding='utf-8') as report_file:
+            json.dump(self.get_report(), report_file, indent=4)
+
+# Instrumentation of the current run, replaced in main() according to the command line options
+instrumentation = Instrumentation()
+# Output folders already created during the current run
+created_folders = set()
+# Links of the map thumbnails rendered during the current run, keyed by rounded coordinate
+map_thumbnail_links = {}
+# Number of the current conversion of a long-running process, sent to the worker processes so they know when to clear their caches too
+conversion_number = 0
+
+# Function to clear the caches that assume the vault did not change since they were filled, before another conversion in the same process
+def clear_conversion_caches(number):
+    global conversion_number
+    conversion_number = number
+    created_folders.clear()
+    map_thumbnail_links.clear()
 
 # Function to create a temporary directory
 def create_temporary_directory():
@@ -56,346 +633,1149 @@ def create_temporary_directory():
 
 # Function to generate frontmatter
 def generate_frontmatter(config, dir_name):
+    return compile_frontmatter(config)(dir_name)
+
+# Function to split JSON data into day-specific folders
+def split_json_data(input_folder, temp_folder, record_store=None):
+    for root, _, files in os.walk(input_folder):
+        for file_name in files:
+            if file_name.endswith('.json'):
+                input_file_path = os.path.join(root, file_name)
+                instrumentation.add('input_files')
+                instrumentation.add('bytes_read', os.path.getsize(input_file_path))
+
+                # Stream the records so only one is held in memory at a time, unless they are kept for the record store
+                stored_entries = [] if record_store is not None else None
+                for record in iter_timeline_records(input_file_path):
+                    instrumentation.add('objects')
+                    date_key = parse_timestamp(record.start_timestamp).date_key
+                    if stored_entries is not None:
+                        stored_entries.append((date_key, get_record_sort_key(record), record))
+
+                    # Create a new JSON file for each day
+                    day_temp_folder = os.path.join(
+                        temp_folder,
+                        "Semantic Location History",
+                        date_key[:4],
+                        format_date(date_key, '%Y_%B'),
+                        date_key
+                    )
+                    os.makedirs(day_temp_folder, exist_ok=True)
+
+                    temp_file_path = os.path.join(day_temp_folder, get_record_sort_key(record))
+
+                    with open(temp_file_path, 'w') as temp_file:
+                        json.dump(record.to_dict(), temp_file, indent=4)
+                    instrumentation.add('temp_files_written')
+
+                if stored_entries is not None:
+                    with instrumentation.phase('store'):
+                        record_store.replace_source(input_file_path, stored_entries)
+
+# Function to get the duration of a record in seconds
+def get_record_duration(record):
+    if record.duration is not None:
+        return record.duration
+    return parse_timestamp(record.end_timestamp).epoch_seconds - parse_timestamp(record.start_timestamp).epoch_seconds
+
+# Function to calculate the hours and minutes of a record
+def calculate_duration(record):
+    # Extract hours and minutes from the duration, including whole days in the hours
+    hours, remainder = divmod(get_record_duration(record), 3600)
+    return hours, remainder // 60
+
+# Function to format the duration of a record as text
+def format_duration(record):
+    hours, minutes = calculate_duration(record)
+    if hours > 0:
+        return f"{hours} hours and {minutes} minutes"
+    return f"{minutes} minutes"
+
+# Function to format a distance in meters as kilometers
+def format_distance(meters):
+    return f"{meters / 1000:.1f} km"
+
+# Function to format a speed in meters per second as kilometers per hour
+def format_speed(meters_per_second):
+    return f"{meters_per_second * 3.6:.1f} km/h"
+
+# Function to combine field formatters into one table cell formatter
+def compile_cell(formatters, separator="", suffix=""):
+    if not formatters:
+        return lambda data: " "  # Empty cells hold a single space
+    if len(formatters) == 1 and not suffix:
+        return formatters[0]
+    if len(formatters) == 2:
+        first, second = formatters
+        return lambda data: first(data) + separator + second(data) + suffix
+    return lambda data: separator.join([formatter(data) for formatter in formatters]) + suffix
+
+# Function to compile a formatter for an iframe of a location
+def compile_iframe(iframe_base_url, lat_field, lng_field, quote):
+    def iframe(record):
+        lat_e7 = getattr(record, lat_field)
+        # Leave the cell empty if the location has no coordinates
+        if lat_e7 is None:
+            return " "
+        src = iframe_base_url.format(loc_lat=e7_to_standard(lat_e7), loc_long=e7_to_standard(getattr(record, lng_field)))
+        return f"<iframe src={quote}{src}{quote}></iframe>"
+    return iframe
+
+# Settings of the static map thumbnails shown instead of iframes
+MapThumbnailSettings = namedtuple('MapThumbnailSettings', ['folder', 'link_folder', 'precision', 'zoom', 'size', 'tile_cache_folder'])
+
+# Function to read the map thumbnail settings from the config
+def compile_map_thumbnail_settings(config):
+    folder_structure = config["output_folder_structure"]
+    thumbnail_folder = config.get("map_thumbnail_folder", "Maps")
+    return MapThumbnailSettings(
+        folder=os.path.join(folder_structure["output_folder"], folder_structure["main_folder_name"], thumbnail_folder),
+        link_folder=f"{folder_structure['main_folder_name']}/{thumbnail_folder}",
+        precision=config.get("map_thumbnail_precision", 4),
+        zoom=config.get("map_thumbnail_zoom", 15),
+        size=config.get("map_thumbnail_size", 200),
+        tile_cache_folder=config.get("map_tile_cache_folder", ""),
+    )
+
+# Function to load a tile of the offline tile cache as a data URI, or None if the cache does not have it
+@lru_cache(maxsize=MAP_TILE_CACHE_SIZE)
+def load_map_tile(tile_cache_folder, zoom, tile_x, tile_y):
+    for extension, mime_type in MAP_TILE_TYPES.items():
+        tile_path = os.path.join(tile_cache_folder, str(zoom), str(tile_x), f"{tile_y}{extension}")
+        if os.path.isfile(tile_path):
+            with open(tile_path, 'rb') as tile_file:
+                return f"data:{mime_type};base64," + base64.b64encode(tile_file.read()).decode('ascii')
+    return None
+
+# Function to render a static map of a location as SVG, from the offline tile cache or as a plain plot of the location
+def render_map_thumbnail(settings, lat, lng):
+    size = settings.size
+    tile_count = 2 ** settings.zoom
+    world_size = MAP_TILE_SIZE * tile_count
+
+    # Web Mercator pixel position of the location, and the top left corner of the thumbnail around it
+    center_x = (lng + 180) / 360 * world_size
+    center_y = (1 - math.asinh(math.tan(math.radians(max(min(lat, MAX_MERCATOR_LATITUDE), -MAX_MERCATOR_LATITUDE)))) / math.pi) / 2 * world_size
+    left = center_x - size / 2
+    top = center_y - size / 2
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {size} {size}">\n',
+        f'<rect width="{size}" height="{size}" fill="#e8eef2"/>\n',  # Background behind missing tiles
+    ]
+    tiles = []
+    if settings.tile_cache_folder:
+        for tile_x in range(math.floor(left / MAP_TILE_SIZE), math.floor((left + size) / MAP_TILE_SIZE) + 1):
+            for tile_y in range(max(math.floor(top / MAP_TILE_SIZE), 0), min(math.floor((top + size) / MAP_TILE_SIZE), tile_count - 1) + 1):
+                tile = load_map_tile(settings.tile_cache_folder, settings.zoom, tile_x % tile_count, tile_y)
+                if tile is not None:
+                    tiles.append(f'<image x="{tile_x * MAP_TILE_SIZE - left:.1f}" y="{tile_y * MAP_TILE_SIZE - top:.1f}" width="{MAP_TILE_SIZE}" height="{MAP_TILE_SIZE}" href="{tile}"/>\n')
+
+    if tiles:
+        parts.extend(tiles)
+    else:
+        # Without tiles, plot the location on a plain grid with its coordinates
+        for line in range(1, 4):
+            offset = size * line / 4
+            parts.append(f'<path d="M{offset:.1f} 0V{size}M0 {offset:.1f}H{size}" stroke="#cfd8dc" stroke-width="1"/>\n')
+        parts.append(f'<text x="{size / 2}" y="{size - 8}" font-family="sans-serif" font-size="11" fill="#546e7a" text-anchor="middle">{lat:.{settings.precision}f}, {lng:.{settings.precision}f}</text>\n')
+
+    parts.append(f'<circle cx="{size / 2}" cy="{size / 2}" r="6" fill="#d93025" stroke="#ffffff" stroke-width="2"/>\n')
+    parts.append('</svg>\n')
+    return "".join(parts)
+
+# Function to get the link of the map thumbnail of a location, rendering it into the thumbnail cache on first use
+def get_map_thumbnail(settings, lat_e7, lng_e7):
+    lat = round(e7_to_standard(lat_e7), settings.precision)
+    lng = round(e7_to_standard(lng_e7), settings.precision)
+    link = map_thumbnail_links.get((lat, lng))
+    if link is None:
+        content = render_map_thumbnail(settings, lat, lng).encode('utf-8')
+        # Thumbnails are named after their content, so every day showing the same map links to the same file
+        file_name = hashlib.sha256(content).hexdigest()[:16] + ".svg"
+        thumbnail_path = os.path.join(settings.folder, file_name)
+        if not os.path.exists(thumbnail_path):
+            ensure_folder(settings.folder)
+            write_file_if_changed(thumbnail_path, content)
+        link = f"{settings.link_folder}/{file_name}"
+        map_thumbnail_links[(lat, lng)] = link
+    return link
+
+# Function to compile a formatter embedding the map thumbnail of a location
+def compile_map_thumbnail(settings, lat_field, lng_field):
+    def thumbnail(record):
+        lat_e7 = getattr(record, lat_field)
+        # Leave the cell empty if the location has no coordinates
+        if lat_e7 is None:
+            return " "
+        return "![[" + get_map_thumbnail(settings, lat_e7, getattr(record, lng_field)) + "]]"
+    return thumbnail
+
+# Function to compile the map formatter of a location, a map thumbnail or an iframe depending on the config
+def compile_location_map(config, iframe_base_url, lat_field, lng_field, quote):
+    if config.get("map_thumbnails", False):
+        return compile_map_thumbnail(compile_map_thumbnail_settings(config), lat_field, lng_field)
+    return compile_iframe(iframe_base_url, lat_field, lng_field, quote)
+
+# Function to compile the start and end time formatters
+def compile_time_formatters(show_start, show_end):
+    formatters = []
+    if show_start:
+        formatters.append(lambda record: "⏳ " + convert_to_24_hour_format(record.start_timestamp))
+    if show_end:
+        formatters.append(lambda record: "⌛ " + convert_to_24_hour_format(record.end_timestamp))
+    return formatters
+
+# Function to compile the frontmatter formatter
+def compile_frontmatter(config):
     if not config["output_frontmatter_toggle"]:
-        return ""  # If frontmatter toggle is false, return an empty string
+        return lambda dir_name: ""  # If frontmatter toggle is false, return an empty string
 
-    frontmatter = "---\n"
-    
+    # Precompute everything except the title, which depends on the day
+    fragments = ["---\n"]
     for key, value in config["output_frontmatter"].items():
-        # If the key is "title," generate the title in the specified format using the dir_name
         if key == "title":
-            # Convert the file name to a datetime object
-            try:
-                date_obj = datetime.strptime(dir_name.split('.')[0], '%Y-%m-%d')
-                title_value = date_obj.strftime(config["output_frontmatter"]["title"]) # Use title to define title format
-                frontmatter += f"{key}: {title_value}\n"
-            except ValueError:
-                # Skip directories that do not match the expected date format
-                continue
-
-        # If the key is "tags," generate the tags in the specified format
+            fragments.append(None)
         if key == "tags":
-            frontmatter += f"{key}:\n"
-            for tag in value.split(","):
-                frontmatter += f"  - {tag.strip()}\n"
-
-    frontmatter += "---\n"
-
+            fragments.append(f"{key}:\n" + "".join(f"  - {tag.strip()}\n" for tag in value.split(",")))
+    fragments.append("---\n")
+    title_format = config["output_frontmatter"].get("title")
+
+    def frontmatter(dir_name):
+        # Convert the file name to a datetime object
+        try:
+            title_line = "title: " + format_date(dir_name, title_format) + "\n"
+        except ValueError:
+            # Skip the title for directories that do not match the expected date format
+            title_line = ""
+        return "".join(title_line if fragment is None else fragment for fragment in fragments)
     return frontmatter
 
-# Function to generate a Markdown table from a list of rows
-def generate_markdown_table(h1, h2, b1, b2):
-    # Create the header row
-    header = f"|{h1}|{h2}|\n"
-    separator = "| --- | --- |\n"
-    body = f"|{b1}|{b2}|"
-
-    # Combine the header, rows, and separator into a Markdown table
-    table = header + separator + body + "\n"
-
-    return table
+# Function to compile the activity segment table cells, or None if no table is needed
+def compile_activity_cells(config, iframe_base_url):
+    show_type = config['output_activity_activityType']
+    show_duration = config['output_activity_formatted_duration']
+    show_start_time = config['output_activity_start_time_24_hour']
+    show_end_time = config['output_activity_end_time_24_hour']
+    show_start_iframe = config['output_activity_start_iframe']
+    show_end_iframe = config['output_activity_end_iframe']
+    # Options added later default to off, so older config files keep working
+    show_distance = config.get('output_activity_distance', False)
+    show_speed = config.get('output_activity_speed', False)
+    if not (show_type or show_duration or show_start_time or show_end_time or show_start_iframe or show_end_iframe or show_distance or show_speed):
+        return None
+
+    # Activity type emoji, formatted duration, distance and average speed
+    type_and_duration = []
+    if show_type:
+        type_and_duration.append(lambda segment: text_to_emoji(segment.activity_type) if segment.activity_type is not None else "")
+    if show_duration:
+        type_and_duration.append(format_duration)
+    if show_distance:
+        type_and_duration.append(lambda segment: "📏 " + format_distance(segment.distance) if segment.distance is not None else "")
+    if show_speed:
+        type_and_duration.append(lambda segment: "💨 " + format_speed(segment.speed) if segment.speed is not None else "")
+
+    return (
+        compile_cell(type_and_duration, " "),
+        compile_cell(compile_time_formatters(show_start_time, show_end_time), " "),
+        compile_location_map(config, iframe_base_url, 'start_lat_e7', 'start_lng_e7', '"') if show_start_iframe else compile_cell([]),
+        compile_location_map(config, iframe_base_url, 'end_lat_e7', 'end_lng_e7', '"') if show_end_iframe else compile_cell([]),
+    )
+
+# Function to compile the place visit table cells, or None if no table is needed
+def compile_place_cells(config, iframe_base_url):
+    show_location = config['output_place_location']
+    show_duration = config['output_place_formatted_duration']
+    show_iframe = config['output_place_iframe']
+    show_start_time = config['output_place_start_time_24_hour']
+    show_end_time = config['output_place_end_time_24_hour']
+    show_address = config['output_place_address']
+    show_semantic_type = config['output_place_semanticType']
+    show_place_id = config['output_place_place_id']
+    if not (show_location or show_duration or show_iframe or show_start_time or show_end_time or show_address or show_semantic_type or show_place_id):
+        return None
+
+    # Detailed data: times, address, semantic type and place ID
+    detailed_data = []
+    if show_start_time or show_end_time or show_address or show_semantic_type or show_place_id:
+        detailed_data.append(compile_cell(compile_time_formatters(show_start_time, show_end_time), " ", "<br>" if show_start_time or show_end_time else ""))
+        if show_address:
+            detailed_data.append(lambda visit: (visit.address if visit.address is not None else 'N/A') + "<br>")
+        if show_semantic_type:
+            detailed_data.append(lambda visit: "Type: " + (visit.semantic_type if visit.semantic_type is not None else 'N/A') + "<br>")
+        if show_place_id:
+            detailed_data.append(lambda visit: "🆔 " + visit.place_id + "<br>" if visit.place_id is not None else "")
+
+    return (
+        (lambda visit: f"📌 {visit.name if visit.name is not None else visit.cluster_label if visit.cluster_label is not None else 'N/A'}") if show_location else compile_cell([]),
+        (lambda visit: "⏱️ " + format_duration(visit)) if show_duration else compile_cell([]),
+        compile_location_map(config, iframe_base_url, 'lat_e7', 'lng_e7', "'") if show_iframe else compile_cell([]),
+        compile_cell(detailed_data),
+    )
+
+# Class holding the formatters compiled from the config, so each record only runs the enabled ones
+class RenderPlan:
+    def __init__(self, config, iframe_base_url):
+        self.frontmatter = compile_frontmatter(config)
+        self.activity_segments = config['output_activity_segments']
+        self.activity_cells = compile_activity_cells(config, iframe_base_url)
+        self.place_visits = config['output_place_visits']
+        self.place_cells = compile_place_cells(config, iframe_base_url)
+
+# Function to compile the config into a rendering plan once per run
+def compile_render_plan(config, iframe_base_url):
+    return RenderPlan(config, iframe_base_url)
+
+# Function to append a Markdown table row built from compiled cells to the output parts
+def append_markdown_table(parts, cells, data):
+    h1, h2, b1, b2 = cells
+    parts.extend(("|", h1(data), "|", h2(data), "|\n| --- | --- |\n|", b1(data), "|", b2(data), "|\n"))
+
+# Function to render an activity segment as Markdown
+def render_activity_segment(render_plan, segment, parts):
+    parts.append("## Activity Segment\n")
+    if render_plan.activity_cells:
+        append_markdown_table(parts, render_plan.activity_cells, segment)
+    parts.append("\n")
+
+# Function to render a place visit as Markdown
+def render_place_visit(render_plan, visit, parts):
+    parts.append("## 🗺️ Place Visit\n")
+    if render_plan.place_cells:
+        append_markdown_table(parts, render_plan.place_cells, visit)
+    parts.append("\n")
+
+# Function to render a day's records as Markdown
+def render_day_markdown(render_plan, dir_name, records):
+    parts = [render_plan.frontmatter(dir_name)]
+
+    for record in records:
+        if record.kind == 'activitySegment':
+            if render_plan.activity_segments:
+                render_activity_segment(render_plan, record, parts)
+
+        elif render_plan.place_visits:
+            render_place_visit(render_plan, record, parts)
+
+    return "".join(parts)
+
+# Function to create a folder once per run
+def ensure_folder(folder):
+    if folder not in created_folders:
+        os.makedirs(folder, exist_ok=True)
+        created_folders.add(folder)
+
+# Function to write a file atomically, leaving it untouched if it already has the same content
+def write_file_if_changed(file_path, content):
+    # Compare the size first so most changed files are detected without reading them
+    try:
+        if os.path.getsize(file_path) == len(content):
+            with open(file_path, 'rb') as existing_file:
+                if existing_file.read() == content:
+                    return False
+    except OSError:
+        pass  # The file does not exist yet
+
+    # Write to a hidden temporary file next to the target and rename it, so the file is never left half written
+    temp_file_path = os.path.join(os.path.dirname(file_path), f".{os.path.basename(file_path)}.{os.getpid()}.tmp")
+    try:
+        with open(temp_file_path, 'wb') as temp_file:
+            temp_file.write(content)
+        os.replace(temp_file_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        raise
+    return True
+
+# Function to write a day's Markdown content into the output folder structure
+def write_day_markdown(markdown_content, dir_name, output_folder, main_folder_name, year_format, month_format, day_format):
+    # Format the folder and file names once per day
+    try:
+        year = format_date(dir_name, year_format) # Use year_format to define year folder name
+        month = format_date(dir_name, month_format) # Use month_format to define month folder name
+        day = format_date(dir_name, day_format) # Use day_format to define day folder name
+    except ValueError:
+        # Skip directories that do not match the expected date format
+        return None
+
+    # Create the subdirectories if they don't exist
+    subfolder = os.path.join(output_folder, main_folder_name, year, month)
+    ensure_folder(subfolder)
+
+    # Construct the full output file path
+    output_file_path = os.path.join(subfolder, day + ".md")
+
+    write_markdown_file(output_file_path, markdown_content)
+    return output_file_path
+
+# Function to write a Markdown file if its content changed
+def write_markdown_file(output_file_path, markdown_content):
+    # Use the platform's line endings, as writing in text mode would
+    content = markdown_content.replace('\n', os.linesep).encode('utf-8')
+    if write_file_if_changed(output_file_path, content):
+        instrumentation.add('files_written')
+        instrumentation.add('bytes_written', len(content))
+    else:
+        instrumentation.add('files_skipped')
 
-# Function to split JSON data into day-specific folders
-def split_json_data(input_folder, temp_folder):
+# Function to merge JSON data into Markdown files
+def merge_json_data(temp_folder, output_folder, iframe_base_url, main_folder_name, year_format, month_format, day_format, day_summaries=None, place_clusters=None):
+    render_plan = compile_render_plan(config, iframe_base_url)
+
+    # Merge the days in date order, so new place clusters are numbered as in the other modes
+    day_folders = sorted((dir_name, os.path.join(root, dir_name)) for root, dirs, _ in os.walk(temp_folder) for dir_name in dirs)
+    for dir_name, day_folder in day_folders:
+        day_files = [f for f in os.listdir(day_folder) if f.endswith('.json')]
+        day_files.sort() # Sort files by name (which contains timestamps)
+
+        records = []
+        for day_file in day_files:
+            with open(os.path.join(day_folder, day_file), 'r', encoding='utf-8') as json_file:
+                records.append(TimelineRecord.from_dict(json.load(json_file)))
+
+        # Only day folders contain JSON files
+        if not records:
+            continue
+
+        if place_clusters is not None:
+            assign_cluster_labels(place_clusters, records)
+        markdown_content = render_day_markdown(render_plan, dir_name, records)
+        instrumentation.add('days_rendered')
+        if day_summaries is not None:
+            day_summaries[dir_name] = summarize_day(records)
+
+        # Write the merged content to a Markdown file
+        if markdown_content:
+            write_day_markdown(markdown_content, dir_name, output_folder, main_folder_name, year_format, month_format, day_format)
+
+# Function to list the JSON files in the input folder
+def list_input_files(input_folder):
+    input_file_paths = []
     for root, _, files in os.walk(input_folder):
         for file_name in files:
             if file_name.endswith('.json'):
-                input_file_path = os.path.join(root, file_name)
-
-                with open(input_file_path, 'r', encoding='utf-8') as json_file:
-                    data = json.load(json_file)
-                    timeline_objects = data['timelineObjects']
-
-                    for timeline_object in timeline_objects:
-                        if 'activitySegment' in timeline_object:
-                            # Check if it's an Activity Segment
-                            segment = timeline_object['activitySegment']
-                            start_timestamp = segment['duration']['startTimestamp']
-                            date = datetime.fromisoformat(start_timestamp.split('.')[0])
-
-                            # Create a new JSON file for each day
-                            day_temp_folder = os.path.join(
-                                temp_folder,
-                                "Semantic Location History",
-                                str(date.year),
-                                date.strftime('%Y_%B'),
-                                date.strftime('%Y-%m-%d')
-                            )
-                            os.makedirs(day_temp_folder, exist_ok=True)
-
-                            temp_filename = clean_filename(f"{start_timestamp}_activity_segment.json")
-                            temp_file_path = os.path.join(day_temp_folder, temp_filename)
-
-                            with open(temp_file_path, 'w') as temp_file:
-                                json.dump(timeline_object, temp_file, indent=4)
-
-                        elif 'placeVisit' in timeline_object:
-                            # Check if it's a Place Visit
-                            visit = timeline_object['placeVisit']
-                            start_timestamp = visit['duration']['startTimestamp']
-                            date = datetime.fromisoformat(start_timestamp.split('.')[0])
-
-                            # Create a new JSON file for each day
-                            day_temp_folder = os.path.join(
-                                temp_folder,
-                                "Semantic Location History",
-                                str(date.year),
-                                date.strftime('%Y_%B'),
-                                date.strftime('%Y-%m-%d')
-                            )
-                            os.makedirs(day_temp_folder, exist_ok=True)
-
-                            temp_filename = clean_filename(f"{start_timestamp}_place_visit.json")
-                            temp_file_path = os.path.join(day_temp_folder, temp_filename)
-
-                            with open(temp_file_path, 'w') as temp_file:
-                                json.dump(timeline_object, temp_file, indent=4)
-
-# Function to merge JSON data into Markdown files
-def merge_json_data(temp_folder, output_folder, iframe_base_url, main_folder_name, year_format, month_format, day_format):
-    for root, dirs, _ in os.walk(temp_folder):
-        for dir_name in dirs:
-            day_folder = os.path.join(root, dir_name)
-            day_files = [f for f in os.listdir(day_folder) if f.endswith('.json')]
-            day_files.sort() # Sort files by name (which contains timestamps)
-
-            markdown_content = generate_frontmatter(config, dir_name)
-
-            for day_file in day_files:
-                with open(os.path.join(day_folder, day_file), 'r', encoding='utf-8') as json_file:
-                    data = json.load(json_file)
-
-                    if 'activitySegment' in data and config['output_activity_segments']:
-                        segment = data['activitySegment']
-
-                        # Get Duration of visit
-                        start_timestamp_str = segment['duration']['startTimestamp']
-                        end_timestamp_str = segment['duration']['endTimestamp']
-                        # Start and end time as string
-                        start_time_24_hour = convert_to_24_hour_format(start_timestamp_str)
-                        end_time_24_hour = convert_to_24_hour_format(end_timestamp_str)
-
-                        # Combine start and end time in to output string
-                        # Initialize the time_output as an empty string
-                        time_output = ""
-                        # Check and add start and end time based on switches
-                        if config['output_activity_start_time_24_hour'] or config['output_activity_end_time_24_hour']:
-                            if config['output_activity_start_time_24_hour']:
-                                time_output += "⏳ " + start_time_24_hour
-                            if config['output_activity_start_time_24_hour'] and config['output_activity_end_time_24_hour']:
-                                time_output += " "
-                            if config['output_activity_end_time_24_hour']:
-                                time_output += "⌛ " + end_time_24_hour
-                        else:
-                            time_output = " "
-
-                        # Parse the timestamps into datetime objects and make them timezone-aware (UTC)
-                        start_timestamp = datetime.fromisoformat(start_timestamp_str.split('.')[0]).replace(tzinfo=timezone.utc)
-                        end_timestamp = datetime.fromisoformat(end_timestamp_str.split('.')[0]).replace(tzinfo=timezone.utc)
-                        # Calculate the duration
-                        duration = end_timestamp - start_timestamp
-                        # Extract hours and minutes from the duration
-                        hours, remainder = divmod(duration.seconds, 3600)
-                        minutes = remainder // 60
-
-                        # Combine activity type emoji and formatted duration as string
-                        # Initialize the type_and_duration as an empty string
-                        type_and_duration = ""
-                        # Check and add type_and_duration based on switches
-                        if config['output_activity_activityType'] or config['output_activity_formatted_duration']:
-                            # Get activity type
-                            if 'activityType' in segment and config['output_activity_activityType']:
-                                activity_type = segment['activityType']
-                                type_and_duration += text_to_emoji(activity_type) # Convert to emoji
-                            if config['output_activity_activityType'] and config['output_activity_formatted_duration']:
-                                type_and_duration += " "
-                            # Format the duration as a string if output is required
-                            if config['output_activity_formatted_duration']:
-                                if hours > 0:
-                                    type_and_duration += f"{hours} hours and {minutes} minutes"
-                                else:
-                                    type_and_duration += f"{minutes} minutes"
-                        else:
-                            type_and_duration = " "
-
-                        # Get start and end location
-                        # Check if 'startLocation' exists and contains 'latitudeE7'
-                        if 'startLocation' in segment and 'latitudeE7' in segment['startLocation']:
-                            start_loc_lat = e7_to_standard(segment['startLocation']['latitudeE7'])
-                            start_loc_long = e7_to_standard(segment['startLocation']['longitudeE7'])
-                        if 'endLocation' in segment and 'latitudeE7' in segment['endLocation']:
-                            end_loc_lat = e7_to_standard(segment['endLocation']['latitudeE7'])
-                            end_loc_long = e7_to_standard(segment['endLocation']['longitudeE7'])
-
-                        # Check and add iframe content based on switches
-                        if config['output_activity_start_iframe'] or config['output_activity_end_iframe']:
-                            if config['output_activity_start_iframe']:
-                                iframe_start = f'<iframe src="{iframe_base_url.format(loc_lat=start_loc_lat, loc_long=start_loc_long)}"></iframe>'
-                            else:
-                                iframe_start = " "
-                            if config['output_activity_end_iframe']:
-                                iframe_end = f'<iframe src="{iframe_base_url.format(loc_lat=end_loc_lat, loc_long=end_loc_long)}"></iframe>'
-                            else:
-                                iframe_end = " "
-
-                        # Add it to the markdown content
-                        markdown_content += f"## Activity Segment\n"
-
-                        # Make table rows based on switches
-                        if (
-                            config['output_activity_activityType']
-                            or config['output_activity_formatted_duration']
-                            or config['output_activity_start_time_24_hour']
-                            or config['output_activity_start_iframe']
-                            or config['output_activity_end_time_24_hour']
-                            or config['output_activity_end_iframe']
-                        ):
-
-                            activity_segment_table = generate_markdown_table(
-                                type_and_duration, time_output, iframe_start, iframe_end
-                            )
-                            # Add the generated table to the markdown content
-                            markdown_content += activity_segment_table
-                        
-                        markdown_content += '\n'
-
-
-                    if 'placeVisit' in data and config['output_place_visits']:
-                        visit = data['placeVisit']
-                        markdown_content += f"## 🗺️ Place Visit\n"
-
-                        # Calculate Duration of visit
-                        start_timestamp_str = visit['duration']['startTimestamp']
-                        end_timestamp_str = visit['duration']['endTimestamp']
-                        # Parse the timestamps into datetime objects and make them timezone-aware (UTC)
-                        start_timestamp = datetime.fromisoformat(start_timestamp_str.split('.')[0]).replace(tzinfo=timezone.utc)
-                        end_timestamp = datetime.fromisoformat(end_timestamp_str.split('.')[0]).replace(tzinfo=timezone.utc)
-                        # Calculate the duration
-                        duration = end_timestamp - start_timestamp
-                        # Extract hours and minutes from the duration
-                        hours, remainder = divmod(duration.seconds, 3600)
-                        minutes = remainder // 60
-                        # Format the duration as a string
-                        if config['output_place_formatted_duration']:
-                            if hours > 0:
-                                formatted_duration = f"⏱️ {hours} hours and {minutes} minutes"
-                            else:
-                                formatted_duration = f"⏱️ {minutes} minutes"
-                        else:
-                            formatted_duration = " "
-
-                        # Get location
-                        # Check if 'location' exists and contains 'latitudeE7'
-                        if 'location' in visit and 'latitudeE7' in visit['location']:
-                            loc_lat = e7_to_standard(visit['location']['latitudeE7'])
-                            loc_long = e7_to_standard(visit['location']['longitudeE7'])
-                        # Start and end time
-                        start_time_24_hour = convert_to_24_hour_format(start_timestamp_str)
-                        end_time_24_hour = convert_to_24_hour_format(end_timestamp_str)
-
-
-                        # Location name
-                        if config['output_place_location']:
-                            location_name = f"📌 {visit['location'].get('name', 'N/A')}"
-                        else:
-                            location_name = " "
-
-
-                        # Format detailed data
-                        if config['output_place_start_time_24_hour'] or config['output_place_end_time_24_hour'] or config['output_place_address'] or config['output_place_semanticType'] or config['output_place_place_id']:
-                            # Combine start and end time in to output string
-                            time_output = ""
-                            # Check and add start and end time based on switches
-                            if config['output_place_start_time_24_hour'] or config['output_place_end_time_24_hour']:
-                                if config['output_place_start_time_24_hour']:
-                                    time_output += "⏳ " + start_time_24_hour
-                                if config['output_place_start_time_24_hour'] and config['output_place_end_time_24_hour']:
-                                    time_output += " "
-                                if config['output_place_end_time_24_hour']:
-                                    time_output += "⌛ " + end_time_24_hour
-                                if config['output_place_start_time_24_hour'] or config['output_place_end_time_24_hour']:
-                                    time_output += "<br>"
-                            else:
-                                time_output = " "
-
-                            # Get address
-                            if config['output_place_address']:
-                                address = visit['location'].get('address', 'N/A') + "<br>"
-                            else:
-                                address = ""
-
-                            # Get semanticType
-                            if config['output_place_semanticType']:
-                                semantic_type = "Type: " + visit['location'].get('semanticType', 'N/A') + "<br>"
-                            else:
-                                semantic_type = ""
-
-                            # Get place_id
-                            if config['output_place_place_id']:
-                                if 'location' in visit and 'placeId' in visit['location']:
-                                    place_id = "🆔 " + visit['location']['placeId'] + "<br>"
-                            else:
-                                place_id = ""
-
-                            detailed_data = time_output + address + semantic_type + place_id
-                        else:
-                            detailed_data = " "
-
-                        # Check and add iframe content based on switches
-                        if config['output_place_iframe']:
-                            iframe_location = f"<iframe src='{iframe_base_url.format(loc_lat=loc_lat, loc_long=loc_long)}'></iframe>"
-                        else:
-                            iframe_location = " "
-
-
-                        # Make table rows based on switches
-                        if (
-                            config['output_place_location']
-                            or config['output_place_formatted_duration']
-                            or config['output_place_iframe']
-                            or config['output_place_start_time_24_hour']
-                            or config['output_place_end_time_24_hour']
-                            or config['output_place_address']
-                            or config['output_place_semanticType']
-                            or config['output_place_place_id']
-                        ):
-
-                            place_visit_table = generate_markdown_table(
-                                location_name, formatted_duration, iframe_location, detailed_data
-                            )
-                            # Add the generated table to the markdown content
-                            markdown_content += place_visit_table
-
-                        markdown_content += '\n'
-
-
-                # Write the merged content to a Markdown file
-                if markdown_content:
-                    # Convert the file name to a datetime object
-                    try:
-                        date_obj = datetime.strptime(dir_name.split('.')[0], '%Y-%m-%d')
-                    except ValueError:
-                        # Skip directories that do not match the expected date format
-                        continue
-
-                    year = date_obj.strftime(year_format) # Use year_format to define year folder name
-                    month = date_obj.strftime(month_format) # Use month_format to define month folder name
-                    day = date_obj.strftime(day_format) # Use day_format to define day folder name
-
-                    # Create the subdirectories if they don't exist
-                    subfolder = os.path.join(output_folder, main_folder_name, year, month)
-                    os.makedirs(subfolder, exist_ok=True)
-
-                    # Construct the full output file path
-                    output_file_path = os.path.join(subfolder, day + ".md")
-                    
-                    with open(output_file_path, 'w', encoding='utf-8') as markdown_file:
-                        markdown_file.write(markdown_content)
-
+                input_file_paths.append(os.path.join(root, file_name))
+    # Sort the files so days spanning several files are always merged in the same order
+    input_file_paths.sort()
+    return input_file_paths
+
+# Function to add the records of one JSON file to the day groups
+def add_json_file_to_day_groups(input_file_path, day_groups, day_filter=None):
+    file_days = set()
+
+    # Stream the records so only one timeline object is held in memory at a time
+    for record in iter_timeline_records(input_file_path):
+        dir_name = parse_timestamp(record.start_timestamp).date_key
+        file_days.add(dir_name)
+        if day_filter is not None and dir_name not in day_filter:
+            continue
+
+        # Use the same sort key as the temporary folder file names
+        day_groups.setdefault(dir_name, []).append((get_record_sort_key(record), record))
+
+    return file_days
+
+# Function to sort the records of each day group by timestamp
+def sort_day_groups(day_groups):
+    for dir_name, entries in day_groups.items():
+        entries.sort(key=lambda entry: entry[0])
+        day_groups[dir_name] = [record for _, record in entries]
+    return day_groups
+
+# Function to read one JSON file into its own day groups in a worker process
+def read_json_file_day_groups(input_file_path, day_filter=None):
+    day_groups = {}
+    file_days = add_json_file_to_day_groups(input_file_path, day_groups, day_filter)
+    return day_groups, file_days
+
+# Function to add the records of several JSON files to the day groups, optionally in parallel
+def add_json_files_to_day_groups(input_file_paths, day_groups, day_filter=None, executor=None, record_store=None):
+    if executor is None:
+        results = map(read_json_file_day_groups, input_file_paths, itertools.repeat(day_filter))
+    else:
+        results = executor.map(read_json_file_day_groups, input_file_paths, itertools.repeat(day_filter))
+
+    # Merge the results in input file order so the day groups are the same either way
+    days_per_file = []
+    for input_file_path, (file_day_groups, file_days) in zip(input_file_paths, results):
+        for dir_name, entries in file_day_groups.items():
+            day_groups.setdefault(dir_name, []).extend(entries)
+            instrumentation.add('objects', len(entries))
+        # Only complete files are stored, which is every file unless a day filter is given
+        if record_store is not None and day_filter is None:
+            with instrumentation.phase('store'):
+                record_store.replace_source(input_file_path, (
+                    (dir_name, sort_key, record) for dir_name, entries in file_day_groups.items() for sort_key, record in entries
+                ))
+        days_per_file.append(file_days)
+        instrumentation.add('input_files')
+        instrumentation.add('bytes_read', os.path.getsize(input_file_path))
+    return days_per_file
+
+# Function to group JSON data by day in memory
+def group_json_data_by_day(input_folder, executor=None, record_store=None):
+    day_groups = {}
+    input_file_paths = list_input_files(input_folder)
+    instrumentation.set_total('input_files', len(input_file_paths))
+    add_json_files_to_day_groups(input_file_paths, day_groups, executor=executor, record_store=record_store)
+    return sort_day_groups(day_groups)
+
+# Function to render one day in a worker process
+def render_day_entry(day_entry):
+    dir_name, records, main_conversion_number = day_entry
+    # The vault may have changed since the previous conversion of the main process, e.g. in watch mode
+    if main_conversion_number != conversion_number:
+        clear_conversion_caches(main_conversion_number)
+    return render_day_markdown(worker_render_plan, dir_name, records)
+
+# Function to render day groups straight into Markdown files
+def render_day_groups(day_groups, output_folder, iframe_base_url, main_folder_name, year_format, month_format, day_format, day_notes=None, executor=None, day_summaries=None, place_clusters=None):
+    dir_names = sorted(day_groups)
+    # Label the unnamed visits in date order before any day is sent to a worker process
+    if place_clusters is not None:
+        with instrumentation.phase('cluster'):
+            for dir_name in dir_names:
+                assign_cluster_labels(place_clusters, day_groups[dir_name])
+
+    if executor is None:
+        render_plan = compile_render_plan(config, iframe_base_url)
+        rendered_days = (render_day_markdown(render_plan, dir_name, day_groups[dir_name]) for dir_name in dir_names)
+    else:
+        # Each worker process compiled its own rendering plan when it started
+        day_entries = ((dir_name, day_groups[dir_name], conversion_number) for dir_name in dir_names)
+        rendered_days = executor.map(render_day_entry, day_entries, chunksize=RENDER_CHUNK_SIZE)
+
+    instrumentation.set_total('days_rendered', len(dir_names))
+
+    # Write the days in date order whichever way they were rendered
+    rendered_days = iter(rendered_days)
+    for dir_name in dir_names:
+        with instrumentation.phase('render'):
+            markdown_content = next(rendered_days)
+        instrumentation.add('days_rendered')
+        if day_summaries is not None:
+            with instrumentation.phase('index'):
+                day_summaries[dir_name] = summarize_day(day_groups[dir_name])
+
+        # Write the merged content to a Markdown file, notes identical to the last run are not rewritten
+        if markdown_content:
+            with instrumentation.phase('write'):
+                output_file_path = write_day_markdown(markdown_content, dir_name, output_folder, main_folder_name, year_format, month_format, day_format)
+            # Remember where the note of each day is, so it can be removed once the day has no data
+            if day_notes is not None and output_file_path:
+                day_notes[dir_name] = os.path.relpath(output_file_path, output_folder).replace(os.sep, '/')
+
+# Class clustering place visit locations within a radius on a grid, so each location is only compared with the clusters in neighbouring cells
+class PlaceClusters:
+    def __init__(self, radius_meters, clusters=(), unnamed_places=0):
+        self.radius_meters = radius_meters
+        self.clusters = []  # [lat, lng, label] of each cluster, the position in the list is its ID
+        self.grid = {}  # Grid cell to the IDs of the clusters centered in it
+        self.unnamed_places = unnamed_places  # Number of the last "Unnamed place" label
+        for lat, lng, label in clusters:
+            self.add(lat, lng, label)
+
+    # Function to get the grid row of a latitude, with rows the height of the radius
+    def get_row(self, lat):
+        return math.floor(math.radians(lat) * EARTH_RADIUS_METERS / self.radius_meters)
+
+    # Function to get the east-west meters per radian of longitude of a grid row, taken at the middle of the row so every location in it uses the same scale
+    def get_row_scale(self, cell_y):
+        row_lat = (cell_y + 0.5) * self.radius_meters / EARTH_RADIUS_METERS
+        return EARTH_RADIUS_METERS * max(math.cos(row_lat), 0.0)
+
+    # Function to get the grid cell of a location, with cells the size of the radius in an equirectangular projection
+    def get_cell(self, lat, lng):
+        cell_y = self.get_row(lat)
+        return math.floor(math.radians(lng) * self.get_row_scale(cell_y) / self.radius_meters), cell_y
+
+    # Function to find the nearest cluster within the radius of a location, or None
+    def find(self, lat, lng):
+        cell_y = self.get_row(lat)
+        # A location within the radius is at most one row away, and its longitude at most lng_span away, the widest at the latitude furthest from the equator
+        far_lat = abs(math.radians(lat)) + self.radius_meters / EARTH_RADIUS_METERS
+        if far_lat < math.pi / 2:
+            lng_span = 2 * math.asin(min(1.0, math.sin(self.radius_meters / (2 * EARTH_RADIUS_METERS)) / math.cos(far_lat)))
+        else:
+            lng_span = math.pi
+        lng_radians = math.radians(lng)
+
+        nearest_id = None
+        nearest_distance = self.radius_meters
+        for row in (cell_y - 1, cell_y, cell_y + 1):
+            # The longitude span covers different cells in each row, as every row has its own scale
+            row_scale = self.get_row_scale(row) / self.radius_meters
+            cells = range(math.floor(max(lng_radians - lng_span, -math.pi) * row_scale), math.floor(min(lng_radians + lng_span, math.pi) * row_scale) + 1)
+            # Near the antimeridian the span continues on the other side of it
+            if lng_span < math.pi and lng_radians - lng_span < -math.pi:
+                cells = itertools.chain(cells, range(math.floor((lng_radians - lng_span + 2 * math.pi) * row_scale), math.floor(math.pi * row_scale) + 1))
+            elif lng_span < math.pi and lng_radians + lng_span > math.pi:
+                cells = itertools.chain(cells, range(math.floor(-math.pi * row_scale), math.floor((lng_radians + lng_span - 2 * math.pi) * row_scale) + 1))
+            for cell_x in cells:
+                for cluster_id in self.grid.get((cell_x, row), ()):
+                    cluster_lat, cluster_lng, _ = self.clusters[cluster_id]
+                    distance = haversine_distance(lat, lng, cluster_lat, cluster_lng)
+                    if distance <= nearest_distance:
+                        nearest_id, nearest_distance = cluster_id, distance
+        return nearest_id
+
+    # Function to add a cluster centered on a location, returning its ID
+    def add(self, lat, lng, label):
+        cluster_id = len(self.clusters)
+        self.clusters.append([lat, lng, label])
+        self.grid.setdefault(self.get_cell(lat, lng), []).append(cluster_id)
+        return cluster_id
+
+    # Function to get the label of the cluster of a location, starting a new cluster if there is none within the radius
+    def get_label(self, lat, lng, name=None):
+        cluster_id = self.find(lat, lng)
+        if cluster_id is None:
+            # Clusters keep the name of the visit that started them, or get a numbered label
+            if name is None:
+                self.unnamed_places += 1
+                name = f"Unnamed place {self.unnamed_places}"
+            cluster_id = self.add(lat, lng, name)
+        return self.clusters[cluster_id][2]
+
+    # Function to load the clusters of earlier runs, starting from scratch if the file is missing or used another radius
+    @classmethod
+    def load(cls, clusters_path, radius_meters):
+        try:
+            with open(clusters_path, 'r', encoding='utf-8') as clusters_file:
+                saved = json.load(clusters_file)
+        except (FileNotFoundError, ValueError):
+            saved = {}
+        if saved.get("version") != CLUSTERS_VERSION or saved.get("radius_meters") != radius_meters:
+            return cls(radius_meters)
+        return cls(radius_meters, saved["clusters"], saved["unnamed_places"])
+
+    # Function to save the clusters, replacing the previous file only once it is fully written
+    def save(self, clusters_path):
+        os.makedirs(os.path.dirname(os.path.abspath(clusters_path)), exist_ok=True)
+        temp_clusters_path = clusters_path + ".tmp"
+        with open(temp_clusters_path, 'w', encoding='utf-8') as clusters_file:
+            json.dump({"version": CLUSTERS_VERSION, "radius_meters": self.radius_meters, "unnamed_places": self.unnamed_places, "clusters": self.clusters}, clusters_file, ensure_ascii=False)
+        os.replace(temp_clusters_path, clusters_path)
+
+# Function to label the unnamed place visits of a day with the cluster of their location
+def assign_cluster_labels(place_clusters, records):
+    visits = [record for record in records if record.kind == 'placeVisit' and record.lat_e7 is not None and record.lng_e7 is not None]
+    # Named visits go first, so an unnamed visit next to a known place gets its name
+    for visit in visits:
+        if visit.name is not None:
+            place_clusters.get_label(e7_to_standard(visit.lat_e7), e7_to_standard(visit.lng_e7), visit.name)
+    for visit in visits:
+        if visit.name is None:
+            visit.cluster_label = place_clusters.get_label(e7_to_standard(visit.lat_e7), e7_to_standard(visit.lng_e7))
+
+# Function to summarize the place visits and activity segments of a day, to be combined into the place and period indexes
+def summarize_day(records):
+    places = {}
+    activities = {}
+    for record in records:
+        seconds = get_record_duration(record)
+        if record.kind == 'activitySegment':
+            activity_type = record.activity_type or 'UNKNOWN_ACTIVITY_TYPE'
+            activity = activities.setdefault(activity_type, {"count": 0, "seconds": 0, "meters": 0})
+            activity["count"] += 1
+            activity["seconds"] += seconds
+            activity["meters"] += record.distance or 0
+
+        elif record.place_id is not None:
+            place = places.setdefault(record.place_id, {"visits": 0, "seconds": 0})
+            place["visits"] += 1
+            place["seconds"] += seconds
+            # Keep the last known details of the place
+            for field in ('name', 'address', 'semantic_type'):
+                if getattr(record, field) is not None:
+                    place[field] = getattr(record, field)
+
+    return {"places": places, "activities": activities}
+
+# Function to get the keys of the periods a day belongs to, e.g. 2023-W05, 2023-01 and 2023
+def get_period_keys(date_key, periods):
+    period_keys = []
+    if "week" in periods:
+        iso_year, iso_week, _ = datetime.strptime(date_key, '%Y-%m-%d').isocalendar()
+        period_keys.append(f"{iso_year}-W{iso_week:02d}")
+    if "month" in periods:
+        period_keys.append(date_key[:7])
+    if "year" in periods:
+        period_keys.append(date_key[:4])
+    return period_keys
+
+# Function to add up a summary's counts into a totals dict
+def add_to_totals(totals, summary):
+    for field, value in summary.items():
+        if isinstance(value, str):
+            totals[field] = value  # Details such as the name are replaced by later ones
+        else:
+            totals[field] = totals.get(field, 0) + value
+
+# Function to combine the day summaries into the place index and the period rollups
+def build_timeline_index(day_summaries, periods):
+    places = {}
+    period_summaries = {}
+    for date_key in sorted(day_summaries):
+        day_summary = day_summaries[date_key]
+
+        for place_id, place_summary in day_summary["places"].items():
+            place = places.setdefault(place_id, {"first_seen": date_key})
+            add_to_totals(place, place_summary)
+            place["last_seen"] = date_key
+
+        for period_key in get_period_keys(date_key, periods):
+            period = period_summaries.setdefault(period_key, {"places": {}, "activities": {}})
+            for place_id, place_summary in day_summary["places"].items():
+                add_to_totals(period["places"].setdefault(place_id, {}), place_summary)
+            for activity_type, activity_summary in day_summary["activities"].items():
+                add_to_totals(period["activities"].setdefault(activity_type, {}), activity_summary)
+
+    return places, period_summaries
+
+# Function to format a number of seconds as hours and minutes
+def format_total_duration(seconds):
+    hours, remainder = divmod(int(seconds), 3600)
+    return f"{hours} hours and {remainder // 60} minutes"
+
+# Function to escape the pipes in a Markdown table cell, including the ones of link aliases
+def escape_table_cell(text):
+    return text.replace('|', '\\|')
+
+# Function to get the link to the place note of a place, showing its name
+def get_place_link(place_id, place):
+    return escape_table_cell(f"[[{clean_filename(place_id)}|{place.get('name') or place_id}]]")
+
+# Function to get the link to the day note of a day
+def get_day_link(date_key, day_format):
+    return f"[[{format_date(date_key, day_format)}]]"
+
+# Function to render the note of a place
+def render_place_note(place_id, place, day_format):
+    name = place.get('name') or place_id
+    parts = ["---\n", "aliases:\n", f"  - {json.dumps(name, ensure_ascii=False)}\n", "---\n", f"# 📌 {name}\n", "| | |\n| --- | --- |\n"]
+    parts.append(f"|Address|{escape_table_cell(place.get('address', 'N/A'))}|\n")
+    parts.append(f"|Type|{place.get('semantic_type', 'N/A')}|\n")
+    parts.append(f"|🆔|{place_id}|\n")
+    parts.append(f"|Visits|{place['visits']}|\n")
+    parts.append(f"|⏱️ Total time|{format_total_duration(place['seconds'])}|\n")
+    parts.append(f"|First seen|{get_day_link(place['first_seen'], day_format)}|\n")
+    parts.append(f"|Last seen|{get_day_link(place['last_seen'], day_format)}|\n")
+    return "".join(parts)
+
+# Function to render the summary note of a week, month or year
+def render_summary_note(period_key, period, places):
+    parts = [f"# {period_key}\n"]
+
+    if period["activities"]:
+        parts.append("## Activities\n| Activity | Count | Distance | Duration | Average speed |\n| --- | --- | --- | --- | --- |\n")
+        for activity_type, activity in sorted(period["activities"].items(), key=lambda item: (-item[1]["meters"], -item[1]["seconds"], item[0])):
+            average_speed = format_speed(activity['meters'] / activity['seconds']) if activity['seconds'] > 0 else " "
+            parts.append(f"|{text_to_emoji(activity_type)} {activity_type}|{activity['count']}|{format_distance(activity['meters'])}|{format_total_duration(activity['seconds'])}|{average_speed}|\n")
+        parts.append("\n")
+
+    if period["places"]:
+        parts.append("## 🗺️ Places\n| Place | Visits | Duration |\n| --- | --- | --- |\n")
+        top_places = sorted(period["places"].items(), key=lambda item: (-item[1]["seconds"], item[0]))[:SUMMARY_TOP_PLACES]
+        for place_id, place in top_places:
+            parts.append(f"|{get_place_link(place_id, places[place_id])}|{place['visits']}|{format_total_duration(place['seconds'])}|\n")
+        parts.append("\n")
+
+    return "".join(parts)
+
+# Function to write the place notes and period summary notes built from the day summaries
+def write_index_notes(day_summaries, output_folder, main_folder_name, day_format):
+    periods = config.get("output_summary_periods", ["week", "month", "year"]) if config.get("output_summary_notes", False) else []
+    places, period_summaries = build_timeline_index(day_summaries, periods)
+    # Paths of the written notes relative to the output folder, so notes no longer produced can be removed
+    note_paths = []
+
+    if config.get("output_place_notes", False):
+        place_folder = os.path.join(output_folder, main_folder_name, config.get("place_note_folder", "Places"))
+        ensure_folder(place_folder)
+        for place_id, place in places.items():
+            note_path = os.path.join(place_folder, clean_filename(place_id) + ".md")
+            write_markdown_file(note_path, render_place_note(place_id, place, day_format))
+            note_paths.append(os.path.relpath(note_path, output_folder).replace(os.sep, '/'))
+
+    for period_key, period in period_summaries.items():
+        # Keep each year's summaries together, weeks belong to their ISO year
+        summary_folder = os.path.join(output_folder, main_folder_name, config.get("summary_note_folder", "Summaries"), period_key[:4])
+        ensure_folder(summary_folder)
+        note_path = os.path.join(summary_folder, period_key + ".md")
+        write_markdown_file(note_path, render_summary_note(period_key, period, places))
+        note_paths.append(os.path.relpath(note_path, output_folder).replace(os.sep, '/'))
+
+    return note_paths
+
+# Function to hash the contents of a file
+def hash_file(file_path):
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as hashed_file:
+        for chunk in iter(lambda: hashed_file.read(JSON_CHUNK_SIZE), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+# Function to hash the config options that change the generated Markdown
+def hash_render_config(config):
+    render_config = {key: value for key, value in config.items() if key.startswith('output_') or key in RENDER_CONFIG_KEYS}
+    return hashlib.sha256(json.dumps(render_config, sort_keys=True).encode('utf-8')).hexdigest()
+
+# Function to load the manifest of a previous run
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+
+    # Start from scratch if the manifest was written by an incompatible version
+    if manifest.get("version") != MANIFEST_VERSION:
+        manifest = {"version": MANIFEST_VERSION, "config_hash": None, "sources": {}, "days": {}, "day_summaries": {}, "index_notes": []}
+    return manifest
+
+# Function to save the manifest, replacing the previous one only once it is fully written
+def save_manifest(manifest_path, manifest):
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    temp_manifest_path = manifest_path + ".tmp"
+    with open(temp_manifest_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+    os.replace(temp_manifest_path, manifest_path)
+
+# Function to find the input files that changed since the manifest was written
+def find_changed_input_files(input_folder, manifest):
+    changed_sources = {}
+    unchanged_sources = {}
+
+    for input_file_path in list_input_files(input_folder):
+        source_key = os.path.relpath(input_file_path, input_folder).replace(os.sep, '/')
+        stat = os.stat(input_file_path)
+        previous = manifest["sources"].get(source_key)
+
+        # Files with the same size and modification time are assumed unchanged
+        if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+            unchanged_sources[source_key] = input_file_path
+            continue
+
+        # Fall back to the content hash, so touched but identical files are not reprocessed
+        file_hash = hash_file(input_file_path)
+        if previous and previous["sha256"] == file_hash:
+            previous["size"] = stat.st_size
+            previous["mtime_ns"] = stat.st_mtime_ns
+            unchanged_sources[source_key] = input_file_path
+            continue
+
+        changed_sources[source_key] = (input_file_path, {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_hash, "days": []})
+
+    return changed_sources, unchanged_sources
+
+# Function to remove the note of a day, place or period that no longer has any data
+def remove_day_note(note_path):
+    try:
+        os.remove(note_path)
+    except FileNotFoundError:
+        pass  # The note was already deleted from the vault
+
+# Function to convert only the days affected by new, changed or removed input files
+def convert_incrementally(input_folder, output_folder, iframe_base_url, main_folder_name, year_format, month_format, day_format, manifest_path, executor=None, summarize=False, record_store=None, place_clusters=None, manifest=None):
+    # A long-running caller keeps the manifest in memory instead of reading it again for every conversion
+    if manifest is None:
+        manifest = load_manifest(manifest_path)
+
+    # Reprocess everything if the output options changed
+    config_hash = hash_render_config(config)
+    if manifest["config_hash"] != config_hash:
+        manifest["config_hash"] = config_hash
+        manifest["sources"] = {}
+        manifest["days"] = {}
+        manifest["day_summaries"] = {}
+        manifest["index_notes"] = []
+
+    with instrumentation.phase('scan'):
+        changed_sources, unchanged_sources = find_changed_input_files(input_folder, manifest)
+    removed_sources = [source_key for source_key in manifest["sources"] if source_key not in changed_sources and source_key not in unchanged_sources]
+
+    # Unchanged files missing from the record store, e.g. when it was just enabled, are read again to store them
+    if record_store is not None:
+        stored_sources = record_store.get_sources()
+        record_store.remove_sources(stored_sources.difference(changed_sources, unchanged_sources))
+        for source_key in list(unchanged_sources):
+            if source_key not in stored_sources:
+                changed_sources[source_key] = (unchanged_sources.pop(source_key), manifest["sources"][source_key])
+
+    # Days previously produced by changed or removed files have to be regenerated
+    affected_days = set()
+    for source_key in list(changed_sources) + removed_sources:
+        affected_days.update(manifest["sources"].get(source_key, {}).get("days", []))
+    for source_key in removed_sources:
+        del manifest["sources"][source_key]
+
+    # Read the changed files in full
+    day_groups = {}
+    changed_keys = sorted(changed_sources)
+    instrumentation.set_total('input_files', len(changed_keys))
+    with instrumentation.phase('read'):
+        days_per_file = add_json_files_to_day_groups([changed_sources[source_key][0] for source_key in changed_keys], day_groups, executor=executor, record_store=record_store)
+    for source_key, file_days in zip(changed_keys, days_per_file):
+        source_entry = changed_sources[source_key][1]
+        source_entry["days"] = sorted(file_days)
+        manifest["sources"][source_key] = source_entry
+        affected_days.update(file_days)
+
+    # Read the unchanged files that share an affected day, keeping only the affected days
+    sharing_file_paths = [input_file_path for source_key, input_file_path in sorted(unchanged_sources.items()) if affected_days.intersection(manifest["sources"][source_key]["days"])]
+    instrumentation.set_total('input_files', len(changed_keys) + len(sharing_file_paths))
+    with instrumentation.phase('read'):
+        add_json_files_to_day_groups(sharing_file_paths, day_groups, day_filter=affected_days, executor=executor)
+
+    # Remove the notes of days that no longer have any data
+    for dir_name in affected_days.difference(day_groups):
+        note_path = manifest["days"].pop(dir_name, None)
+        if note_path:
+            remove_day_note(os.path.join(output_folder, note_path))
+        manifest["day_summaries"].pop(dir_name, None)
+
+    # The summaries of the other days are kept in the manifest, so the indexes are built without reading them again
+    day_summaries = manifest["day_summaries"] if summarize else None
+    render_day_groups(sort_day_groups(day_groups), output_folder, iframe_base_url, main_folder_name, year_format, month_format, day_format, day_notes=manifest["days"], executor=executor, day_summaries=day_summaries, place_clusters=place_clusters)
+
+    # Write the place and period summary notes, and remove the ones of places and periods that no longer have any data
+    if summarize:
+        with instrumentation.phase('index'):
+            index_notes = write_index_notes(day_summaries, output_folder, main_folder_name, day_format)
+            for note_path in set(manifest["index_notes"]).difference(index_notes):
+                remove_day_note(os.path.join(output_folder, note_path))
+        manifest["index_notes"] = sorted(index_notes)
+
+    with instrumentation.phase('manifest'):
+        save_manifest(manifest_path, manifest)
+
+# Function to write the index notes, place clusters and record store changes of a finished conversion
+def finish_conversion(output_folder, main_folder_name, day_format, day_summaries=None, place_clusters=None, clusters_path=None, record_store=None):
+    # Write the place and period summary notes from the summaries collected while converting
+    if day_summaries is not None:
+        with instrumentation.phase('index'):
+            write_index_notes(day_summaries, output_folder, main_folder_name, day_format)
+    if place_clusters is not None:
+        place_clusters.save(clusters_path)
+    if record_store is not None:
+        record_store.commit()
+
+# Function to take a snapshot of the size and modification time of each input file
+def snapshot_input_files(input_folder):
+    snapshot = {}
+    for input_file_path in list_input_files(input_folder):
+        try:
+            stat = os.stat(input_file_path)
+        except FileNotFoundError:
+            # The file was removed after listing the folder
+            continue
+        snapshot[input_file_path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+# Function to count the input files that were added, changed or removed between two snapshots
+def count_changed_input_files(previous_snapshot, snapshot):
+    changed = sum(1 for input_file_path, stat in snapshot.items() if previous_snapshot.get(input_file_path) != stat)
+    return changed + sum(1 for input_file_path in previous_snapshot if input_file_path not in snapshot)
+
+# Function to poll the input folder until it changed and then stayed unchanged for the debounce time, so a drop being copied is converted once it is complete
+def wait_for_input_changes(input_folder, previous_snapshot, interval, debounce):
+    snapshot = previous_snapshot
+    changed_at = None
+    while True:
+        time.sleep(interval)
+        current_snapshot = snapshot_input_files(input_folder)
+        if current_snapshot != snapshot:
+            snapshot = current_snapshot
+            changed_at = time.monotonic()
+        elif changed_at is not None and time.monotonic() - changed_at >= debounce:
+            if snapshot != previous_snapshot:
+                return snapshot
+            # The files changed back to the converted state
+            changed_at = None
+
+# Function to convert the input folder and then keep converting the new and changed input files until interrupted
+def watch_input_folder(input_folder, output_folder, iframe_base_url, main_folder_name, year_format, month_format, day_format, manifest_path, interval, debounce, executor=None, summarize=False, record_store=None, place_clusters=None, clusters_path=None, stats_path=None):
+    global instrumentation
+    manifest = None
+    snapshot = snapshot_input_files(input_folder)
+    changed_files = None
+    # Stop as on Ctrl+C when the watcher is stopped by a service manager or kill
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        while True:
+            # Report the timers and counters of each conversion on its own
+            instrumentation = Instrumentation(show_progress=instrumentation.show_progress)
+            # Folders and thumbnails may have been deleted from the vault since the previous conversion
+            clear_conversion_caches(conversion_number + 1)
+            # The first conversion only reads the files changed since the last run, as a normal incremental run does
+            if manifest is None:
+                manifest = load_manifest(manifest_path)
+            try:
+                convert_incrementally(input_folder, output_folder, iframe_base_url, main_folder_name, year_format, month_format, day_format, manifest_path, executor, summarize, record_store, place_clusters, manifest)
+                finish_conversion(output_folder, main_folder_name, day_format, place_clusters=place_clusters, clusters_path=clusters_path, record_store=record_store)
+                if instrumentation.show_progress:
+                    instrumentation.report_summary()
+                if stats_path:
+                    instrumentation.write_report(stats_path)
+                if changed_files is None:
+                    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] converted the changes since the last run, watching {len(snapshot):,} input files in {input_folder}", file=sys.stderr)
+                else:
+                    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] converted {changed_files:,} new, changed or removed input files", file=sys.stderr)
+            except (OSError, ValueError) as error:
+                if instrumentation.show_progress:
+                    instrumentation.progress_stream.write("\n")
+                # Keep watching, e.g. after a file that is not valid JSON, and retry once the input changes again
+                print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] conversion failed: {error}", file=sys.stderr)
+                manifest = None
+                if record_store is not None:
+                    record_store.rollback()
+
+            next_snapshot = wait_for_input_changes(input_folder, snapshot, interval, debounce)
+            changed_files = count_changed_input_files(snapshot, next_snapshot)
+            snapshot = next_snapshot
+    except KeyboardInterrupt:
+        # Stop watching, the changes of an interrupted conversion are not committed
+        pass
+
+# Class keeping the records of every input file in a SQLite database, so they can be queried and day notes regenerated without reading the input again
+class RecordStore:
+    def __init__(self, database_path, input_folder):
+        os.makedirs(os.path.dirname(os.path.abspath(database_path)), exist_ok=True)
+        self.connection = sqlite3.connect(database_path)
+        self.connection.row_factory = sqlite3.Row
+        self.input_folder = input_folder
+        self.written_sources = set()
+
+        # Start from scratch if the database was written by an incompatible version
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != RECORD_STORE_VERSION:
+            self.connection.executescript("DROP TABLE IF EXISTS records; DROP TABLE IF EXISTS sources;")
+            self.connection.executescript(RECORD_STORE_SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {RECORD_STORE_VERSION}")
+
+    # Function to get the key of an input file, its path relative to the input folder as in the manifest
+    def get_source_key(self, input_file_path):
+        return os.path.relpath(input_file_path, self.input_folder).replace(os.sep, '/')
+
+    # Function to get the keys of the input files in the store
+    def get_sources(self):
+        return {row[0] for row in self.connection.execute("SELECT source FROM sources")}
+
+    # Function to replace the records of an input file with (date_key, sort_key, record) tuples in file order
+    def replace_source(self, input_file_path, entries):
+        source_key = self.get_source_key(input_file_path)
+        self.remove_sources([source_key])
+        self.connection.execute("INSERT INTO sources (source) VALUES (?)", (source_key,))
+        self.connection.executemany(
+            f"INSERT INTO records VALUES ({', '.join('?' * (6 + len(STORED_RECORD_FIELDS)))})",
+            (
+                (source_key, position, date_key, sort_key, parse_timestamp(record.start_timestamp).epoch_seconds, parse_timestamp(record.end_timestamp).epoch_seconds)
+                + tuple(getattr(record, field) for field in STORED_RECORD_FIELDS)
+                for position, (date_key, sort_key, record) in enumerate(entries)
+            )
+        )
+        self.written_sources.add(source_key)
+
+    # Function to remove the records of input files from the store
+    def remove_sources(self, source_keys):
+        for source_key in source_keys:
+            self.connection.execute("DELETE FROM records WHERE source = ?", (source_key,))
+            self.connection.execute("DELETE FROM sources WHERE source = ?", (source_key,))
+
+    # Function to remove the input files not written during this run, after converting every input file
+    def remove_unwritten_sources(self):
+        self.remove_sources(self.get_sources() - self.written_sources)
+
+    # Function to query the records matching all of the given filters, ordered as in the day notes
+    def query_records(self, date_from=None, date_to=None, bbox=None, activity_type=None, kind=None, place_id=None):
+        conditions = []
+        parameters = []
+        if date_from:
+            conditions.append("date >= ?")
+            parameters.append(date_from)
+        if date_to:
+            conditions.append("date <= ?")
+            parameters.append(date_to)
+        if bbox:
+            # Match place visits by their location and activity segments by their start or end location
+            min_lat, min_lng, max_lat, max_lng = (round(value * 10**7) for value in bbox)
+            location_conditions = []
+            for lat_column, lng_column in (('lat_e7', 'lng_e7'), ('start_lat_e7', 'start_lng_e7'), ('end_lat_e7', 'end_lng_e7')):
+                location_conditions.append(f"({lat_column} BETWEEN ? AND ? AND {lng_column} BETWEEN ? AND ?)")
+                parameters.extend((min_lat, max_lat, min_lng, max_lng))
+            conditions.append("(" + " OR ".join(location_conditions) + ")")
+        if activity_type:
+            conditions.append("activity_type = ?")
+            parameters.append(normalize_activity_type(activity_type))
+        if kind:
+            conditions.append("kind = ?")
+            parameters.append(kind)
+        if place_id:
+            conditions.append("place_id = ?")
+            parameters.append(place_id)
+
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return self.connection.execute(f"SELECT * FROM records{where} ORDER BY date, sort_key, source, position", parameters)
+
+    # Function to load the records of a date range as sorted day groups, as group_json_data_by_day reads them from the input
+    def load_day_groups(self, date_from=None, date_to=None):
+        day_groups = {}
+        for row in self.query_records(date_from, date_to):
+            day_groups.setdefault(row['date'], []).append(TimelineRecord(**{field: row[field] for field in STORED_RECORD_FIELDS}))
+        return day_groups
+
+    # Function to keep the changes of a finished conversion
+    def commit(self):
+        self.connection.commit()
+
+    # Function to discard the changes of a failed conversion
+    def rollback(self):
+        self.connection.rollback()
+
+    # Function to close the database, keeping the changes of this run only if it succeeded
+    def close(self, commit=True):
+        if commit:
+            self.connection.commit()
+        else:
+            self.connection.rollback()
+        self.connection.close()
+
+# Function to make worker processes use the same config and rendering plan as the main process
+def init_worker(worker_config, iframe_base_url):
+    global config, worker_render_plan
+    config = worker_config
+    worker_render_plan = compile_render_plan(worker_config, iframe_base_url)
+
+# Function to create the worker process pool, or None when running serially
+def create_process_pool(worker_config, workers):
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(worker_config, worker_config["iframe_base_url"]))
+
+# Function to parse the command line arguments
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Convert Google Maps Timeline data into Obsidian Markdown notes.")
+    parser.add_argument("--workers", type=int, default=None, metavar="N",
+                        help="number of processes used to read input files and render day notes (0 uses every CPU, default: the workers config option or 1)")
+    parser.add_argument("--progress", action="store_true",
+                        help="show a live progress line and a summary of the time spent in each phase")
+    parser.add_argument("--stats", default=None, metavar="FILE",
+                        help="write the phase timers and counters (files, objects, days, bytes read and written) to a JSON file")
+    parser.add_argument("--profile", default=None, metavar="FILE",
+                        help="profile the main process with cProfile and write the stats to a file, readable with the pstats module")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and convert new or changed input files as they arrive, until interrupted with Ctrl+C")
+    return parser.parse_args()
 
 # Main function
 def main():
-    global config
+    global config, instrumentation
+    arguments = parse_arguments()
+    instrumentation = Instrumentation(show_progress=arguments.progress)
     with open('config.json', 'r') as config_file:
         config = json.load(config_file)
 
@@ -408,23 +1788,87 @@ def main():
     day_format = config["output_folder_structure"]["day_format"]
     # Extract iframe template from the config
     iframe_base_url = config["iframe_base_url"]
-
-    # Initialize the temporary directory object
+    # The command line option takes precedence over the config
+    workers = arguments.workers if arguments.workers is not None else config.get("workers", 1)
+    # Day summaries are only collected for the place and period summary notes
+    summarize = config.get("output_place_notes", False) or config.get("output_summary_notes", False)
+    day_summaries = {} if summarize else None
+    # Keep the records in a SQLite database for queryTimeline.py if a database file is configured
+    database_file = config.get("database_file", "")
+    # Label unnamed visits with place clusters kept across runs
+    place_clusters = None
+    clusters_path = os.path.join(output_folder, config.get("cluster_file_name", ".timeline_clusters.json"))
+    if config.get("cluster_unnamed_places", False):
+        place_clusters = PlaceClusters.load(clusters_path, config.get("cluster_radius_meters", 100))
+
+    # Initialize the worker pool, temporary directory and profiler objects
+    executor = None
     temp_folder = None
+    record_store = None
+    profiler = cProfile.Profile() if arguments.profile else None
 
     try:
-        # Create a temporary directory
-        temp_folder = create_temporary_directory()
-        # Get the path of the temporary directory
-        temp_folder_path = temp_folder.name
-        # Split JSON data into temporary folders
-        split_json_data(input_folder, temp_folder_path)
-        # Merge JSON data into Markdown files
-        merge_json_data(temp_folder_path, output_folder, iframe_base_url, main_folder_name, year_format, month_format, day_format)
+        if profiler:
+            profiler.enable()
+        executor = create_process_pool(config, workers)
+        if database_file:
+            record_store = RecordStore(database_file, input_folder)
+
+        # The manifest of the incremental mode is also used by the watch mode
+        manifest_path = os.path.join(output_folder, config.get("manifest_file_name", ".timeline_manifest.json"))
+        if arguments.watch:
+            # Poll the input folder and convert only the files that changed since the previous conversion
+            watch_input_folder(input_folder, output_folder, iframe_base_url, main_folder_name, year_format, month_format, day_format, manifest_path,
+                               config.get("watch_interval_seconds", 10), config.get("watch_debounce_seconds", 5), executor, summarize, record_store, place_clusters, clusters_path, arguments.stats)
+        elif config.get("incremental", False) and not config.get("use_temp_folder", False):
+            # Only regenerate the days affected by changed input files
+            convert_incrementally(input_folder, output_folder, iframe_base_url, main_folder_name, year_format, month_format, day_format, manifest_path, executor, summarize, record_store, place_clusters)
+            # The index notes were written by convert_incrementally, which keeps track of them in the manifest
+            day_summaries = None
+        elif not config.get("use_temp_folder", False):
+            # Group the data by day in memory
+            with instrumentation.phase('read'):
+                day_groups = group_json_data_by_day(input_folder, executor, record_store)
+            render_day_groups(day_groups, output_folder, iframe_base_url, main_folder_name, year_format, month_format, day_format, executor=executor, day_summaries=day_summaries, place_clusters=place_clusters)
+        else:
+            # Create a temporary directory
+            temp_folder = create_temporary_directory()
+            # Get the path of the temporary directory
+            temp_folder_path = temp_folder.name
+            # Split JSON data into temporary folders
+            with instrumentation.phase('split'):
+                split_json_data(input_folder, temp_folder_path, record_store)
+            # Merge JSON data into Markdown files
+            with instrumentation.phase('merge'):
+                merge_json_data(temp_folder_path, output_folder, iframe_base_url, main_folder_name, year_format, month_format, day_format, day_summaries, place_clusters)
+
+        if not arguments.watch:
+            # Every input file was read, so files no longer in the input folder are removed from the store
+            if record_store and (not config.get("incremental", False) or config.get("use_temp_folder", False)):
+                record_store.remove_unwritten_sources()
+            finish_conversion(output_folder, main_folder_name, day_format, day_summaries, place_clusters, clusters_path, record_store)
     finally:
+        if profiler:
+            profiler.disable()
+        # Ensure the worker processes are stopped
+        if executor:
+            executor.shutdown()
+        # Discard the uncommitted changes to the record store of a failed or interrupted run
+        if record_store:
+            record_store.close(commit=False)
         # Ensure cleanup of the temporary directory
         if temp_folder:
             temp_folder.cleanup()
 
+    # Report the instrumentation results, the watch mode reports each conversion as it finishes
+    if profiler:
+        profiler.dump_stats(arguments.profile)
+    if arguments.watch:
+        return
+    if arguments.progress:
+        instrumentation.report_summary()
+    if arguments.stats:
+        instrumentation.write_report(arguments.stats)
+
 if __name__ == "__main__":
     main()